@@ -0,0 +1,48 @@
+"""Benchmark the memoized pub -> DID derivation on a verifier-like workload.
+
+A fleet of a few thousand devices sends many tokens each; every token needs
+the sender DID re-derived from `from.pub`.
+
+Usage: python benchmarks/bench_did_cache.py [--devices N] [--tokens N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from oesp_sdk.core.b64url import encode as b64url_encode, decode as b64url_decode
+from oesp_sdk.core.did import _derive_did, derive_did, did_cache_info, did_cache_clear
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=3000)
+    parser.add_argument("--tokens", type=int, default=500_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pubs = [b64url_encode(rng.randbytes(32)) for _ in range(args.devices)]
+    stream = [pubs[rng.randrange(args.devices)] for _ in range(args.tokens)]
+
+    t0 = time.perf_counter()
+    for pub in stream:
+        _derive_did(b64url_decode(pub))
+    uncached = time.perf_counter() - t0
+
+    did_cache_clear()
+    t0 = time.perf_counter()
+    for pub in stream:
+        derive_did(b64url_decode(pub))
+    cached = time.perf_counter() - t0
+
+    info = did_cache_info()
+    n = args.tokens
+    print(f"{args.devices} devices, {n} tokens")
+    print(f"uncached {uncached / n * 1e6:6.2f} us/token")
+    print(f"cached   {cached / n * 1e6:6.2f} us/token  (hits={info.hits} misses={info.misses} size={info.currsize})")
+    print(f"saving   {(uncached - cached) / n * 1e6:6.2f} us/token")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark bulk packing for a gateway sending to a few recipients.
+
+Compares a `pack()` loop with `pack_many()`, inline and on a thread pool.
+
+Usage: python benchmarks/bench_pack_many.py [--messages N] [--recipients N] [--workers N]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from oesp_sdk.client import OESPClient, MemoryKeystore
+
+class StaticResolver:
+    def __init__(self, table):
+        self.table = table
+    def resolve_did(self, did):
+        return self.table[did]
+
+def report(label, n, elapsed):
+    print(f"{label:<24} {n / elapsed:>10,.0f} tokens/s  ({elapsed * 1e6 / n:6.1f} us/token)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--recipients", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    table = {f"oesp:did:recipient{i}": MemoryKeystore().get_x25519_public() for i in range(args.recipients)}
+    client = OESPClient(MemoryKeystore(), resolver=StaticResolver(table))
+    dids = list(table)
+    messages = [(dids[i % len(dids)], {"seq": i, "data": "x" * 200}) for i in range(args.messages)]
+    n = len(messages)
+    print(f"{n} messages, {args.recipients} recipients")
+
+    t0 = time.perf_counter()
+    for to_did, body in messages:
+        client.pack(to_did, body)
+    report("pack() loop", n, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    client.pack_many(messages)
+    report("pack_many()", n, time.perf_counter() - t0)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        t0 = time.perf_counter()
+        client.pack_many(messages, executor=pool)
+        report(f"pack_many({args.workers} threads)", n, time.perf_counter() - t0)
+
+if __name__ == "__main__":
+    main()
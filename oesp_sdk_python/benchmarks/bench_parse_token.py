@@ -0,0 +1,73 @@
+"""Benchmark parse-only throughput of OESP1 tokens.
+
+Compares the former parser (decode to str, json.loads, EnvelopeV1.from_dict)
+with `parse_token` on the stdlib json backend and, when installed, orjson.
+Token sizes cover a small control message up to a multi-KiB payload.
+
+Best of --repeat runs is reported.
+
+Usage: python benchmarks/bench_parse_token.py [--tokens N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from oesp_sdk.client import OESPClient, MemoryKeystore
+from oesp_sdk.core import jsonutil
+from oesp_sdk.core.b64url import decode as b64url_decode
+from oesp_sdk.core.envelope import EnvelopeV1
+from oesp_sdk.server import parse_token
+
+class SelfResolver:
+    def __init__(self, ks):
+        self.ks = ks
+    def resolve_did(self, did):
+        return self.ks.get_x25519_public()
+
+def legacy_parse(token: str) -> EnvelopeV1:
+    payload_json = b64url_decode(token[len("OESP1."):]).decode("utf-8")
+    return EnvelopeV1.from_dict(json.loads(payload_json))
+
+def run(label, fn, tokens, repeat):
+    elapsed = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for token in tokens:
+            fn(token)
+        elapsed = min(elapsed, time.perf_counter() - t0)
+    print(f"  {label:<20} {len(tokens) / elapsed:>12,.0f} tokens/s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    ks = MemoryKeystore()
+    client = OESPClient(ks, resolver=SelfResolver(ks))
+    did = client.get_did()
+
+    for body_size in (64, 1024, 16 * 1024):
+        body = {"data": "x" * body_size}
+        tokens = [client.pack(did, body) for _ in range(min(args.tokens, 500))]
+        tokens = (tokens * (args.tokens // len(tokens) + 1))[:args.tokens]
+        print(f"body {body_size} B, token {len(tokens[0])} chars")
+
+        legacy = run("legacy", legacy_parse, tokens, args.repeat)
+        backend = jsonutil.orjson
+        jsonutil.orjson = None
+        stdlib = run("parse_token/json", parse_token, tokens, args.repeat)
+        jsonutil.orjson = backend
+        if backend is not None:
+            fast = run("parse_token/orjson", parse_token, tokens, args.repeat)
+            print(f"  speedup: {legacy / stdlib:.2f}x (json), {legacy / fast:.2f}x (orjson)")
+        else:
+            print(f"  speedup: {legacy / stdlib:.2f}x (orjson not installed)")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from .core import (
-    From, To, EnvelopeV1, EnvelopeV1Dict, DecodedMessage, VerifiedEnvelope,
+    From, To, EnvelopeV1, EnvelopeV1Dict, DecodedMessage, VerifiedEnvelope, BatchVerifyResult,
     ErrorCode, OESPError, InvalidSignatureError, ExpiredError, ReplayError,
     InvalidFormatError, UnsupportedAlgError, DecryptionFailedError,
     KexFailedError, StorageError, ResolveFailedError, InvalidDIDError,
@@ -7,20 +7,20 @@ from .core import (
     canonical_json_bytes, derive_did
 )
 from .client import OESPClient, MemoryKeystore, Resolver, Storage
-from .server import ServerPolicy, ReplayStore, InMemoryReplayStore, verify_token, parse_token
+from .server import ServerPolicy, ReplayStore, InMemoryReplayStore, verify_token, verify_tokens_batch, parse_token
 from .transport import OESPBleGattTransport, BleGattLink, BleakGattLink
 from .sync import OESPSyncClient
 
 __version__ = "0.2.2"
 
 __all__ = [
-    "From", "To", "EnvelopeV1", "EnvelopeV1Dict", "DecodedMessage", "VerifiedEnvelope",
+    "From", "To", "EnvelopeV1", "EnvelopeV1Dict", "DecodedMessage", "VerifiedEnvelope", "BatchVerifyResult",
     "ErrorCode", "OESPError", "InvalidSignatureError", "ExpiredError", "ReplayError",
     "InvalidFormatError", "UnsupportedAlgError", "DecryptionFailedError",
     "KexFailedError", "StorageError", "ResolveFailedError", "InvalidDIDError",
     "ClockSkewError", "UnknownDeviceError", "b64url_encode", "b64url_decode",
     "canonical_json_bytes", "derive_did",
     "OESPClient", "MemoryKeystore", "Resolver", "Storage",
-    "ServerPolicy", "ReplayStore", "InMemoryReplayStore", "verify_token", "parse_token",
+    "ServerPolicy", "ReplayStore", "InMemoryReplayStore", "verify_token", "verify_tokens_batch", "parse_token",
     "OESPBleGattTransport", "BleGattLink", "BleakGattLink", "OESPSyncClient"
 ]
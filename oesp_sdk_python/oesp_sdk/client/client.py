@@ -1,10 +1,11 @@
 import json
 import time
 import os
-from typing import Optional, Mapping, Any, Union
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Mapping, Any, Union, Iterable, Tuple, List, Dict
 from ..core.envelope import EnvelopeV1
-from ..core.b64url import encode as b64url_encode, decode as b64url_decode
-from ..core.canonical import canonical_json_bytes
+from ..core.b64url import encode as b64url_encode
+from ..core.canonical import CanonicalEnvelopeEncoder
 from ..core.did import derive_did
 from ..core.types import DecodedMessage, VerifiedEnvelope
 from ..core.errors import (
@@ -22,6 +23,9 @@ from ..crypto.rng import RNG, default_rng
 from .keystore import Keystore
 from .adapters import Storage, Resolver
 
+# mid (12) + session key (32) + iv (12)
+_PACK_RANDOM_BYTES = 56
+
 class OESPClient:
     def __init__(
         self, 
@@ -57,10 +61,9 @@ class OESPClient:
             raise ResolveFailedError("Resolver required for packing")
 
         now = int(time.time())
-        exp = now + ttl_sec
-        mid = b64url_encode(self.rng.read(12))
+        mid = self.rng.read(12)
         sid = self.get_did()
-        ed_pub = self.keystore.get_ed25519_public()
+        pub_b64 = b64url_encode(self.keystore.get_ed25519_public())
         
         try:
             to_x_pub = self.resolver.resolve_did(to_did)
@@ -68,44 +71,105 @@ class OESPClient:
             raise ResolveFailedError(f"Failed to resolve DID {to_did}: {e}")
 
         session_key = self.rng.read(32)
+        iv = self.rng.read(12)
+        return self._pack_one(to_did, to_x_pub, body, mid, session_key, iv, now, ttl_sec, typ, sid, pub_b64)
+
+    def pack_many(
+        self,
+        messages: Iterable[Tuple[str, Union[bytes, Mapping[str, Any]]]],
+        ttl_sec: int = 600,
+        typ: str = "oesp.envelope",
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> List[str]:
+        """Pack `(to_did, body)` pairs; returns tokens in input order.
+
+        Each recipient is resolved once per call and the randomness for the
+        whole batch (mid, session key, iv per message) is read in one go.
+        With a thread pool `executor`, sealing, encryption and signing are
+        spread across it; PyNaCl releases the GIL for these. Process pools are
+        rejected: signing goes through the keystore, which stays in-process.
+        """
+        if isinstance(executor, ProcessPoolExecutor):
+            raise TypeError("pack_many needs a thread pool executor, not a process pool")
+        if self.resolver is None:
+            raise ResolveFailedError("Resolver required for packing")
+        messages = list(messages)
+        if not messages:
+            return []
+
+        now = int(time.time())
+        sid = self.get_did()
+        pub_b64 = b64url_encode(self.keystore.get_ed25519_public())
+
+        recipients: Dict[str, bytes] = {}
+        for to_did, _ in messages:
+            if to_did not in recipients:
+                try:
+                    recipients[to_did] = self.resolver.resolve_did(to_did)
+                except Exception as e:
+                    raise ResolveFailedError(f"Failed to resolve DID {to_did}: {e}")
+
+        # Same per-message order as pack(): mid, session key, iv
+        rnd = self.rng.read(_PACK_RANDOM_BYTES * len(messages))
+
+        def pack_at(i: int) -> str:
+            to_did, body = messages[i]
+            r = rnd[i * _PACK_RANDOM_BYTES:(i + 1) * _PACK_RANDOM_BYTES]
+            return self._pack_one(
+                to_did, recipients[to_did], body, r[:12], r[12:44], r[44:], now, ttl_sec, typ, sid, pub_b64
+            )
+
+        if executor is None:
+            return [pack_at(i) for i in range(len(messages))]
+        return list(executor.map(pack_at, range(len(messages))))
+
+    def _pack_one(
+        self,
+        to_did: str,
+        to_x_pub: bytes,
+        body: Union[bytes, Mapping[str, Any]],
+        mid: bytes,
+        session_key: bytes,
+        iv: bytes,
+        now: int,
+        ttl_sec: int,
+        typ: str,
+        sid: str,
+        pub_b64: str,
+    ) -> str:
         ek_bytes = seal_session_key_x25519(to_x_pub, session_key)
         
-        # Initial env to compute AAD
-        env_dict: Mapping[str, Any] = {
+        # Envelope headers; each field is encoded once and reused for AAD, signature and token
+        canon = CanonicalEnvelopeEncoder({
             "v": 1,
             "typ": typ,
-            "mid": mid,
+            "mid": b64url_encode(mid),
             "sid": sid,
             "ts": now,
-            "exp": exp,
-            "from": {"did": sid, "pub": b64url_encode(ed_pub)},
+            "exp": now + ttl_sec,
+            "from": {"did": sid, "pub": pub_b64},
             "to": {"did": to_did},
             "enc": "CHACHA20-POLY1305",
             "kex": "X25519",
             "ek": b64url_encode(ek_bytes),
-            "iv": "", # Will be filled
-            "ct": "", # Will be filled
             "sig_alg": "Ed25519",
-            "sig": "",
-        }
+        })
 
         # AAD = canonical(envelope headers sans ct/sig/iv)
-        aad = canonical_json_bytes(env_dict, ["ct", "sig", "iv"])
-        iv, ct = aead_encrypt(session_key, self._normalize_body(body), aad=aad, rng=self.rng)
+        aad = canon.aad_bytes()
+        iv, ct = aead_encrypt(session_key, self._normalize_body(body), aad=aad, iv=iv)
         
         # Update env with encrypted data
-        env_dict = dict(env_dict)
-        env_dict["iv"] = b64url_encode(iv)
-        env_dict["ct"] = b64url_encode(ct)
+        canon.set("iv", b64url_encode(iv))
+        canon.set("ct", b64url_encode(ct))
         
         # Sign
         # data_to_sign = canonical(envelope sans "sig") + ct
-        to_sign_base = canonical_json_bytes(env_dict, ["sig"])
-        data_to_sign = to_sign_base + ct
+        data_to_sign = canon.signing_bytes() + ct
         sig = self.keystore.sign(data_to_sign)
-        env_dict["sig"] = b64url_encode(sig)
+        canon.set("sig", b64url_encode(sig))
         
-        token_payload = canonical_json_bytes(env_dict)
+        token_payload = canon.token_bytes()
         return f"OESP1.{b64url_encode(token_payload)}"
 
     def unpack(self, token: str) -> DecodedMessage:
@@ -126,18 +190,18 @@ class OESPClient:
 
         # Decrypt
         try:
-            iv_bytes = b64url_decode(env.iv)
-            ct_bytes = b64url_decode(env.ct)
-            ek_bytes = b64url_decode(env.ek)
-            
-            session_key = open_sealed_session_key_x25519(
-                self.keystore.get_x25519_private(), 
-                ek_bytes
-            )
+            open_sealed = getattr(self.keystore, "open_sealed", None)
+            if open_sealed is not None:
+                session_key = open_sealed(env.ek_bytes)
+            else:
+                session_key = open_sealed_session_key_x25519(
+                    self.keystore.get_x25519_private(), 
+                    env.ek_bytes
+                )
             
             # AAD = canonical(envelope headers sans ct/sig/iv)
-            aad = canonical_json_bytes(env.to_dict(), ["ct", "sig", "iv"])
-            plaintext = aead_decrypt(session_key, iv_bytes, ct_bytes, aad)
+            aad = env.canonical.aad_bytes()
+            plaintext = aead_decrypt(session_key, env.iv_bytes, env.ct_bytes, aad)
         except Exception as e:
             raise DecryptionFailedError(f"Failed to decrypt message: {e}")
 
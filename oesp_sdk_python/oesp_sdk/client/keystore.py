@@ -1,6 +1,6 @@
 from typing import Protocol, Tuple
-from ..crypto.ed25519 import generate_ed25519_keypair, sign_ed25519
-from ..crypto.x25519 import generate_x25519_keypair
+from ..crypto.ed25519 import generate_ed25519_keypair, Ed25519Signer
+from ..crypto.x25519 import generate_x25519_keypair, X25519SealedBoxOpener
 
 class Keystore(Protocol):
     def get_ed25519_public(self) -> bytes:
@@ -14,6 +14,12 @@ class Keystore(Protocol):
     def sign(self, payload: bytes) -> bytes:
         ...
 
+# Optional capability, used by OESPClient.unpack when a keystore provides it:
+#   open_sealed(ek) -> bytes
+#       Open a sealed session key with the keystore's X25519 key, e.g. with a
+#       prepared key object or without exposing the private key. Keystores
+#       without it are opened through get_x25519_private().
+
 class MemoryKeystore:
     def __init__(self):
         ed_priv, ed_pub = generate_ed25519_keypair()
@@ -22,6 +28,9 @@ class MemoryKeystore:
         self._ed_pub = ed_pub
         self._x_priv = x_priv
         self._x_pub = x_pub
+        # Key objects are prepared once instead of per sign/open
+        self._signer = Ed25519Signer(ed_priv)
+        self._opener = X25519SealedBoxOpener(x_priv)
 
     def get_ed25519_public(self) -> bytes:
         return self._ed_pub
@@ -36,7 +45,10 @@ class MemoryKeystore:
         return self._x_priv
 
     def sign(self, payload: bytes) -> bytes:
-        return sign_ed25519(self._ed_priv, payload)
+        return self._signer.sign(payload)
+
+    def open_sealed(self, ek: bytes) -> bytes:
+        return self._opener.open(ek)
 
 class OSKeystore:
     """Placeholder for OS-level secure storage (e.g. Keychain, Keystore)."""
@@ -1,4 +1,4 @@
-from .types import From, To, EnvelopeV1Dict, DecodedMessage, VerifiedEnvelope, ErrorCode
+from .types import From, To, EnvelopeV1Dict, DecodedMessage, VerifiedEnvelope, BatchVerifyResult, ErrorCode
 from .errors import (
     OESPError,
     InvalidSignatureError,
@@ -15,8 +15,8 @@ from .errors import (
     UnknownDeviceError,
 )
 from .b64url import encode as b64url_encode, decode as b64url_decode
-from .canonical import canonical_json_bytes
-from .did import derive_did
+from .canonical import canonical_json_bytes, CanonicalEnvelopeEncoder
+from .did import derive_did, did_cache_info, did_cache_clear
 from .envelope import EnvelopeV1
 
 __all__ = [
@@ -25,6 +25,7 @@ __all__ = [
     "EnvelopeV1Dict",
     "DecodedMessage",
     "VerifiedEnvelope",
+    "BatchVerifyResult",
     "ErrorCode",
     "OESPError",
     "InvalidSignatureError",
@@ -42,6 +43,9 @@ __all__ = [
     "b64url_encode",
     "b64url_decode",
     "canonical_json_bytes",
+    "CanonicalEnvelopeEncoder",
     "derive_did",
+    "did_cache_info",
+    "did_cache_clear",
     "EnvelopeV1",
 ]
@@ -1,5 +1,5 @@
 import json
-from typing import Any, Iterable, Mapping
+from typing import Any, Dict, Iterable, Mapping
 
 def canonical_json_bytes(obj: Mapping[str, Any], exclude_keys: Iterable[str] | None = None) -> bytes:
     """Serialize a JSON object into canonical UTF-8 bytes.
@@ -18,3 +18,52 @@ def canonical_json_bytes(obj: Mapping[str, Any], exclude_keys: Iterable[str] | N
     filtered = remove(obj)
     s = json.dumps(filtered, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
     return s.encode("utf-8")
+
+# Top-level EnvelopeV1 fields in canonical (sorted) order
+ENVELOPE_KEY_ORDER = tuple(sorted((
+    "v", "typ", "mid", "sid", "ts", "exp", "from", "to",
+    "enc", "kex", "ek", "iv", "ct", "sig_alg", "sig", "tag",
+)))
+AAD_EXCLUDE_KEYS = ("ct", "sig", "iv")
+SIGN_EXCLUDE_KEYS = ("sig",)
+
+def _encode_value(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+class CanonicalEnvelopeEncoder:
+    """Canonical bytes of an envelope, with each field encoded only once.
+
+    Every field is serialized to a `"key":value` fragment; the AAD, signing
+    and full token bytes are joins of those fragments in the precomputed key
+    order. Output is byte-identical to `canonical_json_bytes` for envelope
+    mappings produced by `EnvelopeV1.to_dict()`.
+    """
+    __slots__ = ("_fragments",)
+
+    def __init__(self, env: Mapping[str, Any]):
+        self._fragments: Dict[str, bytes] = {}
+        for key, value in env.items():
+            self.set(key, value)
+
+    def set(self, key: str, value: Any) -> None:
+        if key not in _ENVELOPE_KEYS:
+            raise ValueError(f"Unknown envelope field: {key}")
+        self._fragments[key] = _encode_value(key) + b":" + _encode_value(value)
+
+    def encode(self, exclude_keys: Iterable[str] = ()) -> bytes:
+        frags = self._fragments
+        parts = [frags[k] for k in ENVELOPE_KEY_ORDER if k in frags and k not in exclude_keys]
+        return b"{" + b",".join(parts) + b"}"
+
+    def aad_bytes(self) -> bytes:
+        """canonical(envelope sans ct/sig/iv)"""
+        return self.encode(AAD_EXCLUDE_KEYS)
+
+    def signing_bytes(self) -> bytes:
+        """canonical(envelope sans sig); the signed data is this + ct"""
+        return self.encode(SIGN_EXCLUDE_KEYS)
+
+    def token_bytes(self) -> bytes:
+        return self.encode()
+
+_ENVELOPE_KEYS = frozenset(ENVELOPE_KEY_ORDER)
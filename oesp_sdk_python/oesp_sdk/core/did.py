@@ -1,12 +1,31 @@
 import hashlib
 import base64
+from functools import lru_cache
+
+DID_CACHE_SIZE = 8192
+
+def _derive_did(pubkey_bytes: bytes) -> str:
+    digest = hashlib.sha256(pubkey_bytes).digest()
+    # base32 encoding, remove padding, lowercase
+    b32 = base64.b32encode(digest).decode("ascii").rstrip("=").lower()
+    return f"oesp:did:{b32}"
+
+# lru_cache is thread-safe and exposes hit/miss counters via cache_info()
+_derive_did_cached = lru_cache(maxsize=DID_CACHE_SIZE)(_derive_did)
 
 def derive_did(pubkey_bytes: bytes) -> str:
     """Derive OESP DID from a public key.
     
     Spec: DID = "oesp:did:" + base32(sha256(pubkey_bytes)) without padding.
+    Results are memoized in a bounded LRU keyed by public key.
     """
-    digest = hashlib.sha256(pubkey_bytes).digest()
-    # base32 encoding, remove padding, lowercase
-    b32 = base64.b32encode(digest).decode("ascii").rstrip("=").lower()
-    return f"oesp:did:{b32}"
+    if not isinstance(pubkey_bytes, bytes):
+        pubkey_bytes = bytes(pubkey_bytes)
+    return _derive_did_cached(pubkey_bytes)
+
+def did_cache_info():
+    """Hits, misses, maxsize and current size of the pub -> DID cache."""
+    return _derive_did_cached.cache_info()
+
+def did_cache_clear() -> None:
+    _derive_did_cached.cache_clear()
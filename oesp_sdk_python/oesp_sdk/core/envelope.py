@@ -1,11 +1,17 @@
 from dataclasses import dataclass, field
 from typing import Optional, Mapping, Any, Literal
 from .errors import InvalidFormatError
+from .b64url import decode as b64url_decode
+from .canonical import CanonicalEnvelopeEncoder
 
-@dataclass(frozen=True)
+# Decoded fields are cached in private slots on first access; the dataclasses
+# are frozen, so the caches are filled with object.__setattr__.
+
+@dataclass(frozen=True, slots=True)
 class From:
     did: str
     pub: str
+    _pub_bytes: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def from_dict(cls, d: Mapping[str, Any]) -> "From":
@@ -14,7 +20,13 @@ class From:
         except KeyError as e:
             raise InvalidFormatError(f"Missing field in 'from': {e}")
 
-@dataclass(frozen=True)
+    @property
+    def pub_bytes(self) -> bytes:
+        if self._pub_bytes is None:
+            object.__setattr__(self, "_pub_bytes", b64url_decode(self.pub))
+        return self._pub_bytes
+
+@dataclass(frozen=True, slots=True)
 class To:
     did: str
 
@@ -25,7 +37,7 @@ class To:
         except KeyError as e:
             raise InvalidFormatError(f"Missing field in 'to': {e}")
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EnvelopeV1:
     v: Literal[1]
     typ: str
@@ -43,6 +55,11 @@ class EnvelopeV1:
     sig_alg: str
     sig: str
     tag: Optional[str] = None
+    _ek_bytes: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    _iv_bytes: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    _ct_bytes: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    _sig_bytes: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    _canonical: Optional[CanonicalEnvelopeEncoder] = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def from_dict(cls, d: Mapping[str, Any]) -> "EnvelopeV1":
@@ -68,6 +85,41 @@ class EnvelopeV1:
         except (KeyError, TypeError) as e:
             raise InvalidFormatError(f"Invalid envelope structure: {e}")
 
+    @classmethod
+    def from_payload(cls, d: Any) -> "EnvelopeV1":
+        """Build an envelope from a decoded token payload, type-checking every field in one pass."""
+        if type(d) is not dict:
+            raise InvalidFormatError("Envelope must be a JSON object")
+        try:
+            v, ts, exp, sender, recipient = d["v"], d["ts"], d["exp"], d["from"], d["to"]
+            typ, mid, sid, enc, kex = d["typ"], d["mid"], d["sid"], d["enc"], d["kex"]
+            ek, iv, ct, sig_alg, sig = d["ek"], d["iv"], d["ct"], d["sig_alg"], d["sig"]
+        except KeyError as e:
+            raise InvalidFormatError(f"Missing envelope field: {e}")
+        tag = d.get("tag")
+
+        if v != 1 or type(v) is not int:
+            raise InvalidFormatError(f"Unsupported envelope version: {v!r}")
+        if type(ts) is not int or type(exp) is not int:
+            raise InvalidFormatError("'ts' and 'exp' must be integers")
+        if not (
+            type(typ) is str and type(mid) is str and type(sid) is str
+            and type(enc) is str and type(kex) is str and type(ek) is str
+            and type(iv) is str and type(ct) is str and type(sig_alg) is str
+            and type(sig) is str and (tag is None or type(tag) is str)
+        ):
+            raise InvalidFormatError("Envelope string fields must be strings")
+        if type(sender) is not dict or type(sender.get("did")) is not str or type(sender.get("pub")) is not str:
+            raise InvalidFormatError("'from' must be an object with string 'did' and 'pub'")
+        if type(recipient) is not dict or type(recipient.get("did")) is not str:
+            raise InvalidFormatError("'to' must be an object with a string 'did'")
+
+        return cls(
+            v, typ, mid, sid, ts, exp,
+            From(sender["did"], sender["pub"]), To(recipient["did"]),
+            enc, kex, ek, iv, ct, sig_alg, sig, tag,
+        )
+
     def to_dict(self) -> Mapping[str, Any]:
         d = {
             "v": self.v,
@@ -89,3 +141,38 @@ class EnvelopeV1:
         if self.tag is not None:
             d["tag"] = self.tag
         return d
+
+    @property
+    def ek_bytes(self) -> bytes:
+        if self._ek_bytes is None:
+            object.__setattr__(self, "_ek_bytes", b64url_decode(self.ek))
+        return self._ek_bytes
+
+    @property
+    def iv_bytes(self) -> bytes:
+        if self._iv_bytes is None:
+            object.__setattr__(self, "_iv_bytes", b64url_decode(self.iv))
+        return self._iv_bytes
+
+    @property
+    def ct_bytes(self) -> bytes:
+        if self._ct_bytes is None:
+            object.__setattr__(self, "_ct_bytes", b64url_decode(self.ct))
+        return self._ct_bytes
+
+    @property
+    def sig_bytes(self) -> bytes:
+        if self._sig_bytes is None:
+            object.__setattr__(self, "_sig_bytes", b64url_decode(self.sig))
+        return self._sig_bytes
+
+    @property
+    def canonical(self) -> CanonicalEnvelopeEncoder:
+        """Canonical encoder of this envelope (AAD, signing and token bytes)."""
+        if self._canonical is None:
+            object.__setattr__(self, "_canonical", CanonicalEnvelopeEncoder(self.to_dict()))
+        return self._canonical
+
+    def signed_data(self) -> bytes:
+        """canonical(envelope sans "sig") + ct"""
+        return self.canonical.signing_bytes() + self.ct_bytes
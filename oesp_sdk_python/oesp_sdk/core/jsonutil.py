@@ -0,0 +1,16 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional: pip install oesp-sdk[fast]
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+def loads_bytes(data: bytes) -> Any:
+    """Parse UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    # Decoding explicitly skips json's pure-Python encoding detection on bytes
+    return json.loads(data.decode("utf-8"))
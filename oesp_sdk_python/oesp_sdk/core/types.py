@@ -39,6 +39,13 @@ class VerifiedEnvelope(TypedDict):
     verified: bool
     signer_did: str
 
+class BatchVerifyResult(TypedDict):
+    index: int
+    ok: bool
+    result: Optional[VerifiedEnvelope]
+    error_code: Optional[str]
+    error: Optional[str]
+
 class ErrorCode:
     INVALID_SIGNATURE = "INVALID_SIGNATURE"
     EXPIRED = "EXPIRED"
@@ -1,5 +1,11 @@
-from .ed25519 import generate_ed25519_keypair, sign_ed25519, verify_ed25519
-from .x25519 import generate_x25519_keypair, seal_session_key_x25519, open_sealed_session_key_x25519
+from .ed25519 import generate_ed25519_keypair, sign_ed25519, verify_ed25519, Ed25519Signer, get_verify_key
+from .x25519 import (
+    generate_x25519_keypair,
+    seal_session_key_x25519,
+    open_sealed_session_key_x25519,
+    X25519SealedBoxOpener,
+    get_sealing_box,
+)
 from .aead import aead_encrypt, aead_decrypt
 from .rng import RNG, OSRNG, DeterministicRNG, default_rng
 
@@ -7,9 +13,13 @@ __all__ = [
     "generate_ed25519_keypair",
     "sign_ed25519",
     "verify_ed25519",
+    "Ed25519Signer",
+    "get_verify_key",
     "generate_x25519_keypair",
     "seal_session_key_x25519",
     "open_sealed_session_key_x25519",
+    "X25519SealedBoxOpener",
+    "get_sealing_box",
     "aead_encrypt",
     "aead_decrypt",
     "RNG",
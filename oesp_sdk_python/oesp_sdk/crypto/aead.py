@@ -2,12 +2,16 @@ from typing import Tuple, Optional
 from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
 from .rng import RNG, default_rng
 
-def aead_encrypt(session_key: bytes, plaintext: bytes, aad: bytes, rng: Optional[RNG] = None) -> Tuple[bytes, bytes]:
-    """Encrypt using ChaCha20-Poly1305 AEAD."""
+def aead_encrypt(
+    session_key: bytes, plaintext: bytes, aad: bytes, rng: Optional[RNG] = None, iv: Optional[bytes] = None
+) -> Tuple[bytes, bytes]:
+    """Encrypt using ChaCha20-Poly1305 AEAD. `iv` is drawn from `rng` unless given."""
     if len(session_key) != 32:
         raise ValueError("session_key must be 32 bytes")
-    rng = rng or default_rng
-    iv = rng.read(12)
+    if iv is None:
+        iv = (rng or default_rng).read(12)
+    elif len(iv) != 12:
+        raise ValueError("iv must be 12 bytes")
     aead = ChaCha20Poly1305(session_key)
     ct = aead.encrypt(iv, plaintext, aad)
     return iv, ct
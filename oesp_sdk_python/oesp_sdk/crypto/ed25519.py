@@ -1,12 +1,30 @@
+from functools import lru_cache
 from typing import Tuple
 from nacl.signing import SigningKey, VerifyKey
 
+VERIFY_KEY_CACHE_SIZE = 4096
+
 def generate_ed25519_keypair() -> Tuple[bytes, bytes]:
     """Generate an Ed25519 identity keypair."""
     sk = SigningKey.generate()
     vk = sk.verify_key
     return sk.encode(), vk.encode()
 
+class Ed25519Signer:
+    """Ed25519 signing key prepared once and reused for every signature."""
+    __slots__ = ("_sk",)
+
+    def __init__(self, priv: bytes):
+        self._sk = SigningKey(priv)
+
+    def sign(self, data: bytes) -> bytes:
+        return self._sk.sign(data).signature
+
+@lru_cache(maxsize=VERIFY_KEY_CACHE_SIZE)
+def get_verify_key(pub: bytes) -> VerifyKey:
+    """Return a prepared VerifyKey for a sender public key (bounded LRU)."""
+    return VerifyKey(pub)
+
 def sign_ed25519(priv: bytes, data: bytes) -> bytes:
     """Sign data with Ed25519."""
     sk = SigningKey(priv)
@@ -16,7 +34,7 @@ def sign_ed25519(priv: bytes, data: bytes) -> bytes:
 def verify_ed25519(pub: bytes, data: bytes, sig: bytes) -> bool:
     """Verify Ed25519 signature."""
     try:
-        vk = VerifyKey(pub)
+        vk = get_verify_key(pub)
         vk.verify(data, sig)
         return True
     except Exception:
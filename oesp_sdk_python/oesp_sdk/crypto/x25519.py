@@ -1,17 +1,33 @@
+from functools import lru_cache
 from typing import Tuple
 from nacl.public import PublicKey, PrivateKey, SealedBox
 
+SEALING_BOX_CACHE_SIZE = 1024
+
 def generate_x25519_keypair() -> Tuple[bytes, bytes]:
     """Generate an X25519 keypair."""
     sk = PrivateKey.generate()
     pk = sk.public_key
     return bytes(sk), bytes(pk)
 
+class X25519SealedBoxOpener:
+    """Recipient sealed box prepared once and reused to open every session key."""
+    __slots__ = ("_box",)
+
+    def __init__(self, priv: bytes):
+        self._box = SealedBox(PrivateKey(priv))
+
+    def open(self, ek: bytes) -> bytes:
+        return self._box.decrypt(ek)
+
+@lru_cache(maxsize=SEALING_BOX_CACHE_SIZE)
+def get_sealing_box(recipient_pub: bytes) -> SealedBox:
+    """Return a prepared sealed box for a recipient public key (bounded LRU)."""
+    return SealedBox(PublicKey(recipient_pub))
+
 def seal_session_key_x25519(recipient_pub: bytes, session_key: bytes) -> bytes:
     """Seal a session key to the recipient using X25519 sealed box."""
-    pk = PublicKey(recipient_pub)
-    box = SealedBox(pk)
-    return box.encrypt(session_key)
+    return get_sealing_box(recipient_pub).encrypt(session_key)
 
 def open_sealed_session_key_x25519(recipient_priv: bytes, ek: bytes) -> bytes:
     """Open a sealed session key using recipient X25519 private key."""
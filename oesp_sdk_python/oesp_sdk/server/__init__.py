@@ -1,16 +1,26 @@
-from .verifier import parse_token, verify_token, verify_envelope
+from .verifier import parse_token, verify_token, verify_envelope, verify_tokens_batch
 from .policies import ServerPolicy
 from .replay import ReplayStore, InMemoryReplayStore, SqlReplayStore
+from .prefilter import BloomFilter, BloomReplayStore
+from .async_verifier import AsyncReplayStore, averify_token, averify_batch
+from .async_replay import SqlAlchemyReplayStore
 from .hooks import OnValidHook, OnInvalidHook
 
 __all__ = [
     "parse_token",
     "verify_token",
     "verify_envelope",
+    "verify_tokens_batch",
+    "averify_token",
+    "averify_batch",
     "ServerPolicy",
     "ReplayStore",
     "InMemoryReplayStore",
     "SqlReplayStore",
+    "BloomFilter",
+    "BloomReplayStore",
+    "AsyncReplayStore",
+    "SqlAlchemyReplayStore",
     "OnValidHook",
     "OnInvalidHook",
 ]
@@ -0,0 +1,82 @@
+from typing import TYPE_CHECKING, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+class SqlAlchemyReplayStore:
+    """AsyncReplayStore on an SQLAlchemy AsyncEngine (PostgreSQL or SQLite).
+
+    Pass the application's engine so the store shares its connection pool.
+    Requires SQLAlchemy: pip install oesp-sdk[async]
+    """
+
+    def __init__(self, engine: "AsyncEngine", table_name: str = "oesp_replay"):
+        try:
+            import sqlalchemy as sa
+        except ImportError as e:
+            raise ImportError("SqlAlchemyReplayStore requires SQLAlchemy: pip install oesp-sdk[async]") from e
+
+        self._sa = sa
+        self._engine = engine
+        self._metadata = sa.MetaData()
+        self.table = sa.Table(
+            table_name,
+            self._metadata,
+            sa.Column("from_did", sa.String, primary_key=True),
+            sa.Column("mid", sa.String, primary_key=True),
+        )
+        if engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise ValueError(f"Unsupported dialect for SqlAlchemyReplayStore: {engine.dialect.name}")
+        self._insert = insert
+
+    async def create_table(self) -> None:
+        async with self._engine.begin() as conn:
+            await conn.run_sync(self._metadata.create_all)
+
+    async def seen(self, mid: str, from_did: str) -> bool:
+        t = self.table
+        stmt = self._sa.select(self._sa.literal(1)).where(t.c.from_did == from_did, t.c.mid == mid)
+        async with self._engine.connect() as conn:
+            return (await conn.execute(stmt)).first() is not None
+
+    async def mark_seen(self, mid: str, from_did: str) -> None:
+        await self.check_and_mark(mid, from_did)
+
+    async def check_and_mark(self, mid: str, from_did: str, expires_at: Optional[float] = None) -> bool:
+        stmt = self._insert(self.table).values(from_did=from_did, mid=mid).on_conflict_do_nothing()
+        async with self._engine.begin() as conn:
+            result = await conn.execute(stmt)
+        return result.rowcount == 0
+
+    async def check_and_mark_many(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        expires_at: Optional[Sequence[Optional[float]]] = None,
+    ) -> List[bool]:
+        pairs = list(pairs)
+        if not pairs:
+            return []
+        # One multi-row insert; RETURNING yields the pairs that were new
+        t = self.table
+        unique = list(dict.fromkeys(pairs))
+        stmt = (
+            self._insert(t)
+            .values([{"from_did": did, "mid": mid} for mid, did in unique])
+            .on_conflict_do_nothing()
+            .returning(t.c.mid, t.c.from_did)
+        )
+        async with self._engine.begin() as conn:
+            inserted = {(row.mid, row.from_did) for row in await conn.execute(stmt)}
+
+        out: List[bool] = []
+        for pair in pairs:
+            if pair in inserted:
+                inserted.discard(pair)
+                out.append(False)
+            else:
+                out.append(True)
+        return out
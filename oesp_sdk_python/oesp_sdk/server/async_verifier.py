@@ -0,0 +1,106 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from functools import partial
+from typing import Iterable, List, Optional, Protocol, Sequence, Tuple
+
+from ..core.errors import ReplayError
+from ..core.types import VerifiedEnvelope, BatchVerifyResult
+from .policies import ServerPolicy
+from .verifier import verify_token, verify_tokens_batch, _replay_expiry
+
+class AsyncReplayStore(Protocol):
+    async def seen(self, mid: str, from_did: str) -> bool:
+        ...
+    async def mark_seen(self, mid: str, from_did: str) -> None:
+        ...
+
+# As with ReplayStore, async stores may also provide
+#   async check_and_mark(mid, from_did, expires_at=None) -> bool
+#   async check_and_mark_many(pairs, expires_at=None) -> List[bool]
+# which the async verifier prefers over seen/mark_seen.
+
+async def _acheck_and_mark(
+    replay_store: AsyncReplayStore, mid: str, from_did: str, expires_at: Optional[int]
+) -> bool:
+    check_and_mark = getattr(replay_store, "check_and_mark", None)
+    if check_and_mark is not None:
+        return await check_and_mark(mid, from_did, expires_at)
+    if await replay_store.seen(mid, from_did):
+        return True
+    await replay_store.mark_seen(mid, from_did)
+    return False
+
+async def _acheck_and_mark_many(
+    replay_store: AsyncReplayStore,
+    pairs: List[Tuple[str, str]],
+    expires_at: Sequence[Optional[int]],
+) -> List[bool]:
+    check_many = getattr(replay_store, "check_and_mark_many", None)
+    if check_many is not None:
+        return await check_many(pairs, expires_at)
+    # Sequential on purpose: a pair repeated in the batch must see the earlier mark
+    return [
+        await _acheck_and_mark(replay_store, mid, did, exp)
+        for (mid, did), exp in zip(pairs, expires_at)
+    ]
+
+async def averify_token(
+    token: str,
+    *,
+    now: Optional[int] = None,
+    policy: ServerPolicy = ServerPolicy(),
+    replay_store: Optional[AsyncReplayStore] = None,
+    executor: Optional[Executor] = None,
+) -> VerifiedEnvelope:
+    """Async `verify_token`: crypto runs in `executor` (the loop default if None), replay is awaited."""
+    if now is None:
+        now = int(time.time())
+    loop = asyncio.get_running_loop()
+    verified = await loop.run_in_executor(executor, partial(verify_token, token, now=now, policy=policy))
+
+    if replay_store is not None:
+        env = verified["envelope"]
+        mid, from_did = env["mid"], env["from"]["did"]
+        if await _acheck_and_mark(replay_store, mid, from_did, _replay_expiry(env["exp"], policy)):
+            raise ReplayError(f"Duplicate message ID {mid} for DID {from_did}")
+    return verified
+
+async def averify_batch(
+    tokens: Iterable[str],
+    *,
+    now: Optional[int] = None,
+    policy: ServerPolicy = ServerPolicy(),
+    replay_store: Optional[AsyncReplayStore] = None,
+    executor: Optional[Executor] = None,
+) -> List[BatchVerifyResult]:
+    """Async `verify_tokens_batch`; verified envelopes are replay-checked in one call."""
+    if now is None:
+        now = int(time.time())
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(
+        executor, partial(verify_tokens_batch, list(tokens), now=now, policy=policy)
+    )
+    if replay_store is None:
+        return results
+
+    ok = [r for r in results if r["ok"]]
+    if not ok:
+        return results
+    envs = [r["result"]["envelope"] for r in ok]
+    replays = await _acheck_and_mark_many(
+        replay_store,
+        [(env["mid"], env["from"]["did"]) for env in envs],
+        [_replay_expiry(env["exp"], policy) for env in envs],
+    )
+    for r, env, replayed in zip(ok, envs, replays):
+        if replayed:
+            err = ReplayError(f"Duplicate message ID {env['mid']} for DID {env['from']['did']}")
+            results[r["index"]] = {
+                "index": r["index"],
+                "ok": False,
+                "result": None,
+                "error_code": err.code,
+                "error": err.detail or str(err),
+            }
+    return results
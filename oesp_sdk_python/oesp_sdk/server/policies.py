@@ -2,6 +2,7 @@ from dataclasses import dataclass
 
 @dataclass(frozen=True)
 class ServerPolicy:
+    # While expired tokens are accepted, replay entries cannot expire either
     allow_expired: bool = True
     max_clock_skew_sec: int = 300
     require_known_device: bool = False
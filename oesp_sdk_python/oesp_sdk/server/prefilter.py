@@ -0,0 +1,216 @@
+import inspect
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .replay import ReplayStore, _replay_key
+
+class BloomFilter:
+    """Fixed-size Bloom filter over replay keys.
+
+    Sized for `capacity` entries at `fp_rate`; `max_bytes` caps the bit array,
+    in which case the false-positive rate at full capacity rises accordingly.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = 0.001, max_bytes: Optional[int] = None):
+        if capacity <= 0 or not 0 < fp_rate < 1:
+            raise ValueError("capacity must be > 0 and fp_rate in (0, 1)")
+        bits = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        if max_bytes is not None:
+            bits = min(bits, max_bytes * 8)
+        self.num_bits = max(bits, 8)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+    def _positions(self, key: bytes) -> List[int]:
+        # Double hashing (Kirsch-Mitzenmacher) over the two halves of the 16-byte key
+        h1 = int.from_bytes(key[:8], "little")
+        h2 = int.from_bytes(key[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, key: bytes) -> None:
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self._bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def clear(self) -> None:
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
+
+    def estimated_fp_rate(self) -> float:
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+class BloomReplayStore:
+    """Bloom pre-filter in front of any ReplayStore.
+
+    Lookups that miss the filter are answered as "not seen" from memory; only
+    possible hits reach the backing store. Writes always go to the backing
+    store. The filter only knows the writes made through it, plus what
+    `rebuild()` loads from the backing store, so the backing store must not
+    be written by other verifiers while this filter is in use.
+    """
+
+    def __init__(
+        self,
+        backing: ReplayStore,
+        capacity: int = 1_000_000,
+        fp_rate: float = 0.001,
+        max_bytes: Optional[int] = None,
+    ):
+        self.backing = backing
+        self.bloom = BloomFilter(capacity, fp_rate, max_bytes)
+        self._filtered = 0
+        self._passed = 0
+        self._false_positives = 0
+        self._lock = threading.Lock()
+        # Keys claimed on a filter miss whose backing write has not finished
+        self._inflight: Set[bytes] = set()
+        # ReplayStore.mark_seen takes (mid, from_did); expiring stores also accept expires_at
+        try:
+            self._mark_takes_expiry = "expires_at" in inspect.signature(backing.mark_seen).parameters
+        except (TypeError, ValueError):
+            self._mark_takes_expiry = False
+
+    def rebuild(self, pairs: Optional[Iterable[Tuple[str, str]]] = None) -> int:
+        """Refill the filter from `pairs`, or from `backing.iter_keys()`; return the count."""
+        if pairs is None:
+            iter_keys = getattr(self.backing, "iter_keys", None)
+            if iter_keys is None:
+                raise TypeError(f"{type(self.backing).__name__} cannot enumerate its keys")
+            pairs = iter_keys()
+        self.bloom.clear()
+        for mid, from_did in pairs:
+            self.bloom.add(_replay_key(mid, from_did))
+        return self.bloom.count
+
+    def seen(self, mid: str, from_did: str) -> bool:
+        if _replay_key(mid, from_did) not in self.bloom:
+            self._filtered += 1
+            return False
+        self._passed += 1
+        result = self.backing.seen(mid, from_did)
+        if not result:
+            self._false_positives += 1
+        return result
+
+    def mark_seen(self, mid: str, from_did: str, expires_at: Optional[float] = None) -> None:
+        self._mark_backing(mid, from_did, expires_at)
+        self.bloom.add(_replay_key(mid, from_did))
+
+    def _mark_backing(self, mid: str, from_did: str, expires_at: Optional[float]) -> None:
+        if expires_at is not None and self._mark_takes_expiry:
+            self.backing.mark_seen(mid, from_did, expires_at)
+        else:
+            self.backing.mark_seen(mid, from_did)
+
+    def check_and_mark(self, mid: str, from_did: str, expires_at: Optional[float] = None) -> bool:
+        key = _replay_key(mid, from_did)
+        with self._lock:
+            possible = key in self.bloom
+            if not possible:
+                # Definitely new: claim the key so a concurrent duplicate takes the slow path
+                self.bloom.add(key)
+                self._inflight.add(key)
+            elif key in self._inflight:
+                # The first copy is being written right now
+                self._count(True, True)
+                return True
+        if not possible:
+            # Write only, no lookup
+            try:
+                self._mark_backing(mid, from_did, expires_at)
+            finally:
+                with self._lock:
+                    self._inflight.discard(key)
+            self._count(False, False)
+            return False
+
+        check_and_mark = getattr(self.backing, "check_and_mark", None)
+        if check_and_mark is not None:
+            result = check_and_mark(mid, from_did, expires_at)
+        elif self.backing.seen(mid, from_did):
+            result = True
+        else:
+            self._mark_backing(mid, from_did, expires_at)
+            result = False
+        self._count(True, result)
+        return result
+
+    def check_and_mark_many(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        expires_at: Optional[Sequence[Optional[float]]] = None,
+    ) -> List[bool]:
+        pairs = list(pairs)
+        check_many = getattr(self.backing, "check_and_mark_many", None)
+        if check_many is None:
+            expiries = expires_at if expires_at is not None else [None] * len(pairs)
+            return [self.check_and_mark(mid, did, exp) for (mid, did), exp in zip(pairs, expiries)]
+
+        keys = [_replay_key(mid, did) for mid, did in pairs]
+        results: List[Optional[bool]] = [None] * len(pairs)
+        possible: List[bool] = []
+        claimed: List[bytes] = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._inflight:
+                    # Being written by a concurrent call, or earlier in this batch
+                    results[i] = True
+                    possible.append(True)
+                elif key in self.bloom:
+                    possible.append(True)
+                else:
+                    possible.append(False)
+                    self.bloom.add(key)
+                    self._inflight.add(key)
+                    claimed.append(key)
+
+        todo = [i for i, result in enumerate(results) if result is None]
+        try:
+            if todo:
+                expiries = [expires_at[i] for i in todo] if expires_at is not None else None
+                for i, result in zip(todo, check_many([pairs[i] for i in todo], expiries)):
+                    results[i] = result
+        finally:
+            with self._lock:
+                self._inflight.difference_update(claimed)
+
+        for maybe, result in zip(possible, results):
+            self._count(maybe, result)
+        return results
+
+    def _count(self, possible: bool, result: bool) -> None:
+        # A filter miss that the backing store still reports as seen was written
+        # behind the filter's back; count it with the lookups that fell through
+        if not possible and not result:
+            self._filtered += 1
+        else:
+            self._passed += 1
+            if not result:
+                self._false_positives += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": self.bloom.count,
+            "size_bytes": self.bloom.size_bytes,
+            "num_hashes": self.bloom.num_hashes,
+            "estimated_fp_rate": self.bloom.estimated_fp_rate(),
+            "filtered": self._filtered,
+            "passed": self._passed,
+            "false_positives": self._false_positives,
+        }
@@ -1,5 +1,12 @@
+import hashlib
+import heapq
+import itertools
+import math
 import sqlite3
-from typing import Protocol, Set
+import threading
+import time
+import weakref
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Set, Tuple
 
 class ReplayStore(Protocol):
     def seen(self, mid: str, from_did: str) -> bool:
@@ -7,36 +14,244 @@ class ReplayStore(Protocol):
     def mark_seen(self, mid: str, from_did: str) -> None:
         ...
 
+# Optional fast path, used by the verifier when a store provides it:
+#   check_and_mark(mid, from_did, expires_at=None) -> bool
+#       True if (mid, from_did) was already seen, otherwise records it and returns False.
+#   check_and_mark_many(pairs, expires_at=None) -> List[bool]
+#       Same for a sequence of (mid, from_did) pairs, in order.
+# `expires_at` (unix seconds, or a sequence parallel to `pairs`) is when an entry
+# may be forgotten; stores that do not expire entries ignore it.
+
+# Default bound of InMemoryReplayStore: 1M entries take roughly 170 MB
+DEFAULT_MAX_ENTRIES = 1_000_000
+
+def _replay_key(mid: str, from_did: str) -> bytes:
+    return hashlib.blake2b(f"{from_did}\x00{mid}".encode("utf-8"), digest_size=16).digest()
+
 class InMemoryReplayStore:
-    def __init__(self):
-        self._seen: Set[str] = set()
+    """In-memory replay store with expiry-based and optional size-bounded eviction.
+
+    Entries are keyed by a 16-byte digest of (from_did, mid). An entry marked
+    with `expires_at` is dropped once that time has passed; entries without
+    one are kept until `max_entries` forces out the soonest-expiring entry.
+    Expired entries are evicted a few at a time on each insert.
+
+    The verifier only sets `expires_at` under `ServerPolicy(allow_expired=False)`.
+    With the default policy expired tokens stay valid, so entries never expire
+    and `max_entries` (DEFAULT_MAX_ENTRIES unless given; None for no bound) is
+    what keeps the store from growing forever.
+    """
+
+    EVICT_STEP = 64
+
+    def __init__(self, max_entries: Optional[int] = DEFAULT_MAX_ENTRIES, clock: Callable[[], float] = time.time):
+        self._seen: Dict[bytes, float] = {}
+        # (expires_at, insertion order, key): entries without an expiry are evicted oldest first
+        self._heap: List[Tuple[float, int, bytes]] = []
+        self._order = itertools.count()
+        self._max_entries = max_entries
+        self._clock = clock
+        self._evicted_expired = 0
+        self._evicted_capacity = 0
+        self._replays = 0
+
+    def __len__(self) -> int:
+        return len(self._seen)
 
     def seen(self, mid: str, from_did: str) -> bool:
-        return f"{from_did}:{mid}" in self._seen
+        return self._lookup(_replay_key(mid, from_did), self._clock())
 
-    def mark_seen(self, mid: str, from_did: str) -> None:
-        self._seen.add(f"{from_did}:{mid}")
+    def mark_seen(self, mid: str, from_did: str, expires_at: Optional[float] = None) -> None:
+        self._add(_replay_key(mid, from_did), expires_at, self._clock())
+
+    def check_and_mark(self, mid: str, from_did: str, expires_at: Optional[float] = None) -> bool:
+        key = _replay_key(mid, from_did)
+        now = self._clock()
+        if self._lookup(key, now):
+            self._replays += 1
+            return True
+        self._add(key, expires_at, now)
+        return False
+
+    def check_and_mark_many(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        expires_at: Optional[Sequence[Optional[float]]] = None,
+    ) -> List[bool]:
+        pairs = list(pairs)
+        expiries = expires_at if expires_at is not None else [None] * len(pairs)
+        return [self.check_and_mark(mid, did, exp) for (mid, did), exp in zip(pairs, expiries)]
+
+    def evict_expired(self, now: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """Drop entries whose expiry has passed; return how many were removed."""
+        if now is None:
+            now = self._clock()
+        heap, seen = self._heap, self._seen
+        removed = 0
+        while heap and heap[0][0] < now and (limit is None or removed < limit):
+            exp, _, key = heapq.heappop(heap)
+            # Skip stale heap items left by a re-mark with a later expiry
+            if seen.get(key) == exp:
+                del seen[key]
+                removed += 1
+        self._evicted_expired += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._seen),
+            "max_entries": self._max_entries or 0,
+            "evicted_expired": self._evicted_expired,
+            "evicted_capacity": self._evicted_capacity,
+            "replays": self._replays,
+        }
+
+    def _lookup(self, key: bytes, now: float) -> bool:
+        exp = self._seen.get(key)
+        if exp is None:
+            return False
+        if exp < now:
+            del self._seen[key]
+            self._evicted_expired += 1
+            return False
+        return True
+
+    def _add(self, key: bytes, expires_at: Optional[float], now: float) -> None:
+        exp = math.inf if expires_at is None else float(expires_at)
+        self.evict_expired(now, limit=self.EVICT_STEP)
+        if key not in self._seen and self._max_entries is not None:
+            while len(self._seen) >= self._max_entries and self._heap:
+                old_exp, _, old_key = heapq.heappop(self._heap)
+                if self._seen.get(old_key) == old_exp:
+                    del self._seen[old_key]
+                    self._evicted_capacity += 1
+        if self._seen.get(key, -math.inf) < exp:
+            self._seen[key] = exp
+            heapq.heappush(self._heap, (exp, next(self._order), key))
+
+class _ThreadConn:
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+def _release_conn(lock: threading.RLock, conns: Set[sqlite3.Connection], conn: sqlite3.Connection) -> None:
+    with lock:
+        if conn not in conns:
+            # Already closed by SqlReplayStore.close()
+            return
+        conns.discard(conn)
+    conn.close()
 
 class SqlReplayStore:
+    """SQLite replay store with one persistent WAL connection per thread.
+
+    `":memory:"` databases are not shared between connections, so they use a
+    single connection guarded by a lock instead. A thread's connection is
+    closed when the thread exits; `close()` closes the ones still open.
+    """
+
     def __init__(self, db_path: str):
         self._db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Reentrant: a finalizer may run during garbage collection while it is held
+        self._conns_lock = threading.RLock()
+        self._conns: Set[sqlite3.Connection] = set()
+        self._shared: Optional[sqlite3.Connection] = None
+        if db_path == ":memory:":
+            self._shared = self._connect()
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: single statements commit on their own, batches use explicit BEGIN.
+        # Thread-local connections are only used by their thread; close() may run elsewhere.
+        conn = sqlite3.connect(self._db_path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conns_lock:
+            self._conns.add(conn)
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._shared is not None:
+            return self._shared
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._local.holder = _ThreadConn(self._connect())
+            # Thread-local data is dropped when the thread exits, which closes the connection
+            weakref.finalize(holder, _release_conn, self._conns_lock, self._conns, holder.conn)
+        return holder.conn
+
     def _init_db(self):
-        with sqlite3.connect(self._db_path) as conn:
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS replay_store (from_did TEXT, mid TEXT, PRIMARY KEY(from_did, mid))"
-            )
+        self._run(lambda conn: conn.execute(
+            "CREATE TABLE IF NOT EXISTS replay_store (from_did TEXT, mid TEXT, PRIMARY KEY(from_did, mid))"
+        ))
+
+    def _run(self, fn):
+        if self._shared is not None:
+            with self._lock:
+                return fn(self._shared)
+        return fn(self._conn())
 
     def seen(self, mid: str, from_did: str) -> bool:
-        with sqlite3.connect(self._db_path) as conn:
-            cur = conn.execute(
-                "SELECT 1 FROM replay_store WHERE from_did = ? AND mid = ?", (from_did, mid)
-            )
-            return cur.fetchone() is not None
+        cur = self._run(lambda conn: conn.execute(
+            "SELECT 1 FROM replay_store WHERE from_did = ? AND mid = ?", (from_did, mid)
+        ))
+        return cur.fetchone() is not None
 
-    def mark_seen(self, mid: str, from_did: str) -> None:
-        with sqlite3.connect(self._db_path) as conn:
-            conn.execute(
-                "INSERT OR IGNORE INTO replay_store (from_did, mid) VALUES (?, ?)", (from_did, mid)
-            )
+    def mark_seen(self, mid: str, from_did: str, expires_at: Optional[float] = None) -> None:
+        self._run(lambda conn: conn.execute(
+            "INSERT OR IGNORE INTO replay_store (from_did, mid) VALUES (?, ?)", (from_did, mid)
+        ))
+
+    def iter_keys(self, page_size: int = 10_000) -> Iterator[Tuple[str, str]]:
+        """Yield every stored (mid, from_did) pair, reading in rowid pages."""
+        last = 0
+        while True:
+            rows = self._run(lambda conn: conn.execute(
+                "SELECT rowid, mid, from_did FROM replay_store WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last, page_size),
+            ).fetchall())
+            if not rows:
+                return
+            for _, mid, from_did in rows:
+                yield mid, from_did
+            last = rows[-1][0]
+
+    def check_and_mark(self, mid: str, from_did: str, expires_at: Optional[float] = None) -> bool:
+        # The insert is the check: it is ignored (rowcount 0) if the pair already exists
+        cur = self._run(lambda conn: conn.execute(
+            "INSERT OR IGNORE INTO replay_store (from_did, mid) VALUES (?, ?)", (from_did, mid)
+        ))
+        return cur.rowcount == 0
+
+    def check_and_mark_many(
+        self,
+        pairs: Iterable[Tuple[str, str]],
+        expires_at: Optional[Sequence[Optional[float]]] = None,
+    ) -> List[bool]:
+        def batch(conn: sqlite3.Connection) -> List[bool]:
+            out: List[bool] = []
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for mid, from_did in pairs:
+                    cur = conn.execute(
+                        "INSERT OR IGNORE INTO replay_store (from_did, mid) VALUES (?, ?)", (from_did, mid)
+                    )
+                    out.append(cur.rowcount == 0)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return out
+        return self._run(batch)
+
+    def close(self) -> None:
+        with self._conns_lock:
+            conns = list(self._conns)
+            self._conns.clear()
+        for conn in conns:
+            conn.close()
+        self._shared = None
+        self._local = threading.local()
@@ -1,11 +1,11 @@
-import json
 import time
-from typing import Optional, Mapping, Any
+from typing import Optional, Mapping, Any, Iterable, List, Tuple
 from ..core.envelope import EnvelopeV1
 from ..core.b64url import decode as b64url_decode
-from ..core.canonical import canonical_json_bytes
+from ..core.jsonutil import loads_bytes
 from ..core.did import derive_did
 from ..core.errors import (
+    OESPError,
     InvalidFormatError,
     ExpiredError,
     InvalidSignatureError,
@@ -13,8 +13,8 @@ from ..core.errors import (
     ClockSkewError,
     InvalidDIDError,
 )
-from ..core.types import VerifiedEnvelope
-from ..crypto.ed25519 import verify_ed25519
+from ..core.types import VerifiedEnvelope, BatchVerifyResult, ErrorCode
+from ..crypto.ed25519 import verify_ed25519, get_verify_key
 from .policies import ServerPolicy
 from .replay import ReplayStore
 
@@ -24,24 +24,13 @@ def parse_token(token: str) -> EnvelopeV1:
         raise InvalidFormatError("Invalid token prefix")
     
     try:
-        payload_b64 = token[len("OESP1."):]
-        payload_json = b64url_decode(payload_b64).decode("utf-8")
-        data = json.loads(payload_json)
-        return EnvelopeV1.from_dict(data)
+        data = loads_bytes(b64url_decode(token[6:]))
     except Exception as e:
         raise InvalidFormatError(f"Failed to parse token: {e}")
+    return EnvelopeV1.from_payload(data)
 
-def verify_envelope(
-    env: EnvelopeV1,
-    *,
-    now: Optional[int] = None,
-    policy: ServerPolicy = ServerPolicy(),
-    replay_store: Optional[ReplayStore] = None
-) -> VerifiedEnvelope:
-    """Verify an EnvelopeV1 against a policy and replay store."""
-    if now is None:
-        now = int(time.time())
-
+def _check_policy(env: EnvelopeV1, now: int, policy: ServerPolicy) -> bytes:
+    """Apply type, expiry, clock skew and DID checks; return the sender pubkey bytes."""
     # 1. Structure/Type validation (already done by EnvelopeV1.from_dict mostly)
     if policy.enforce_typ and env.typ != policy.enforce_typ:
         raise InvalidFormatError(f"Unexpected envelope type: {env.typ}")
@@ -54,30 +43,53 @@ def verify_envelope(
         raise ClockSkewError(f"Timestamp {env.ts} too far from now {now}")
 
     # 3. DID/PubKey match
-    pub_bytes = b64url_decode(env.sender.pub)
+    pub_bytes = env.sender.pub_bytes
     derived = derive_did(pub_bytes)
     if derived != env.sender.did:
         raise InvalidDIDError(f"DID {env.sender.did} does not match pubkey")
+    return pub_bytes
 
-    # 4. Signature verification
-    # data_to_sign = canonical(envelope sans "sig") + ct
-    env_dict = env.to_dict()
-    ct_bytes = b64url_decode(env.ct)
-    sig_bytes = b64url_decode(env.sig)
-    
-    # We need the canonical bytes of the envelope WITHOUT the signature
-    to_sign_base = canonical_json_bytes(env_dict, exclude_keys=["sig"])
-    data_to_sign = to_sign_base + ct_bytes
-    
-    if not verify_ed25519(pub_bytes, data_to_sign, sig_bytes):
-        raise InvalidSignatureError()
+def _replay_error(env: EnvelopeV1) -> ReplayError:
+    return ReplayError(f"Duplicate message ID {env.mid} for DID {env.sender.did}")
 
-    # 5. Anti-replay
+def _replay_expiry(exp: int, policy: ServerPolicy) -> Optional[int]:
+    # Once exp + skew has passed the token is rejected as expired, so its replay
+    # entry can go. With allow_expired it stays valid forever and must be kept.
+    if policy.allow_expired:
+        return None
+    return exp + policy.max_clock_skew_sec
+
+def _check_replay(env: EnvelopeV1, replay_store: Optional[ReplayStore], policy: ServerPolicy) -> None:
     if replay_store is not None:
+        check_and_mark = getattr(replay_store, "check_and_mark", None)
+        if check_and_mark is not None:
+            if check_and_mark(env.mid, env.sender.did, _replay_expiry(env.exp, policy)):
+                raise _replay_error(env)
+            return
         if replay_store.seen(env.mid, env.sender.did):
-            raise ReplayError(f"Duplicate message ID {env.mid} for DID {env.sender.did}")
+            raise _replay_error(env)
         replay_store.mark_seen(env.mid, env.sender.did)
 
+def verify_envelope(
+    env: EnvelopeV1,
+    *,
+    now: Optional[int] = None,
+    policy: ServerPolicy = ServerPolicy(),
+    replay_store: Optional[ReplayStore] = None
+) -> VerifiedEnvelope:
+    """Verify an EnvelopeV1 against a policy and replay store."""
+    if now is None:
+        now = int(time.time())
+
+    pub_bytes = _check_policy(env, now, policy)
+
+    # 4. Signature verification
+    if not verify_ed25519(pub_bytes, env.signed_data(), env.sig_bytes):
+        raise InvalidSignatureError()
+
+    # 5. Anti-replay
+    _check_replay(env, replay_store, policy)
+
     return {
         "envelope": env.to_dict(),
         "verified": True,
@@ -94,3 +106,81 @@ def verify_token(
     """High-level function to parse and verify a token."""
     env = parse_token(token)
     return verify_envelope(env, now=now, policy=policy, replay_store=replay_store)
+
+def verify_tokens_batch(
+    tokens: Iterable[str],
+    *,
+    now: Optional[int] = None,
+    policy: ServerPolicy = ServerPolicy(),
+    replay_store: Optional[ReplayStore] = None
+) -> List[BatchVerifyResult]:
+    """Parse and verify a batch of tokens in one pass.
+
+    Returns one result per token, in input order. Failures carry the same
+    error codes `verify_token` would raise; verify keys come from the shared
+    per-sender cache.
+    """
+    if now is None:
+        now = int(time.time())
+
+    results: List[BatchVerifyResult] = []
+    # Envelopes that passed every check but replay; marked in one call when the store supports it
+    pending: List[Tuple[int, EnvelopeV1]] = []
+    check_many = getattr(replay_store, "check_and_mark_many", None) if replay_store is not None else None
+
+    for index, token in enumerate(tokens):
+        try:
+            env = parse_token(token)
+            pub_bytes = _check_policy(env, now, policy)
+
+            try:
+                vk = get_verify_key(pub_bytes)
+            except Exception as e:
+                raise InvalidSignatureError(f"Invalid sender key: {e}")
+
+            try:
+                vk.verify(env.signed_data(), env.sig_bytes)
+            except Exception:
+                raise InvalidSignatureError()
+
+            if check_many is None:
+                _check_replay(env, replay_store, policy)
+
+            results.append({
+                "index": index,
+                "ok": True,
+                "result": {
+                    "envelope": env.to_dict(),
+                    "verified": True,
+                    "signer_did": env.sender.did
+                },
+                "error_code": None,
+                "error": None,
+            })
+            if check_many is not None:
+                pending.append((index, env))
+        except OESPError as e:
+            results.append(_batch_error(index, e.code, e.detail or str(e)))
+        except Exception as e:
+            results.append(_batch_error(index, ErrorCode.INVALID_FORMAT, str(e)))
+
+    if pending:
+        replays = check_many(
+            [(env.mid, env.sender.did) for _, env in pending],
+            [_replay_expiry(env.exp, policy) for _, env in pending],
+        )
+        for (index, env), replayed in zip(pending, replays):
+            if replayed:
+                err = _replay_error(env)
+                results[index] = _batch_error(index, err.code, err.detail or str(err))
+
+    return results
+
+def _batch_error(index: int, code: str, error: str) -> BatchVerifyResult:
+    return {
+        "index": index,
+        "ok": False,
+        "result": None,
+        "error_code": code,
+        "error": error,
+    }
@@ -1,89 +1,172 @@
+import asyncio
 import httpx
 import json
 import hashlib
-import base64
-from typing import List, Optional, Dict, Any, TypedDict
+from typing import Optional, Dict, Any, TypedDict, Union, Iterable, Iterator, AsyncIterable, AsyncIterator, Set, Tuple
+from ..core.b64url import encode as b64url_encode
 from .env import SyncConfig, get_sync_config
 
+TokenSource = Union[Iterable[str], AsyncIterable[str]]
+
 class SyncSummary(TypedDict):
     success: bool
     uploaded_count: int
     total_bytes: int
     session_id: Optional[str]
+    skipped_chunks: int
+    inserted: Optional[int]
+    duplicates: Optional[int]
+    invalid: Optional[int]
     error: Optional[str]
 
+async def _aiter_tokens(tokens: TokenSource) -> AsyncIterator[str]:
+    if hasattr(tokens, "__aiter__"):
+        async for token in tokens:
+            yield token
+    else:
+        for token in tokens:
+            yield token
+
+async def iter_jsonl_chunks(lines: AsyncIterator[bytes], max_chunk_bytes: int) -> AsyncIterator[bytes]:
+    """Pack a stream of lines into chunks of exactly `max_chunk_bytes` (last one shorter).
+
+    Lines may straddle chunk boundaries; only the chunk being filled is held in memory.
+    """
+    buf = bytearray()
+    async for line in lines:
+        view = memoryview(line)
+        pos = 0
+        while pos < len(view):
+            take = min(max_chunk_bytes - len(buf), len(view) - pos)
+            buf += view[pos:pos + take]
+            pos += take
+            if len(buf) == max_chunk_bytes:
+                yield bytes(buf)
+                buf.clear()
+    if buf:
+        yield bytes(buf)
+
 class OESPSyncClient:
     def __init__(
         self, 
         base_url: Optional[str] = None,
         api_key: Optional[str] = None,
         timeout_sec: float = 30.0,
-        max_chunk_bytes: int = 500000
+        max_chunk_bytes: int = 500000,
+        upload_window: int = 4,
+        max_retries: int = 3,
+        binary_chunks: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None
     ):
-        self.config = get_sync_config(base_url, api_key, timeout_sec, max_chunk_bytes)
+        self.config = get_sync_config(
+            base_url, api_key, timeout_sec, max_chunk_bytes, upload_window, max_retries, binary_chunks
+        )
+        self._transport = transport
 
     def set_base_url(self, url: str):
         self.config["base_url"] = url
 
+    def _url(self, path: str) -> str:
+        return f"{self.config['base_url']}/v1/sync{path}"
+
     async def sync_tokens(
         self,
-        tokens: List[str],
+        tokens: TokenSource,
         device_did: str,
         device_pub_b64: Optional[str] = None,
         client_meta: Optional[Dict[str, Any]] = None,
-        allow_expired: bool = True
+        allow_expired: bool = True,
+        expected_total_bytes: int = 0,
+        expected_total_items: Optional[int] = None
     ) -> SyncSummary:
-        async with httpx.AsyncClient(timeout=self.config["timeout_sec"]) as client:
+        """Upload tokens to the sync server using the /v1/sync chunk protocol.
+
+        `tokens` may be any iterable or async iterable; lines are encoded lazily
+        and hashed incrementally, so peak memory is about `upload_window` chunks.
+        Calling again with the same tokens and `client_meta` resumes the open
+        session and skips chunks the server already holds with the same hash;
+        chunks that differ are uploaded again. A session holding chunks past
+        the end of this stream belongs to an older backlog: it is replaced by a
+        fresh session and the tokens are uploaded again, unless `tokens` is a
+        one-shot iterator, in which case the call fails and must be repeated.
+        """
+        if expected_total_items is None:
+            expected_total_items = len(tokens) if hasattr(tokens, "__len__") else 0
+
+        headers = {"X-OESP-DEVICE": device_did}
+        if self.config["api_key"]:
+            headers["X-OESP-APIKEY"] = self.config["api_key"]
+
+        async with httpx.AsyncClient(
+            timeout=self.config["timeout_sec"], headers=headers, transport=self._transport
+        ) as client:
+            session_id: Optional[str] = None
             try:
-                # 1. Start Session
-                start_res = await client.post(
-                    f"{self.config['base_url']}/sync/start",
-                    json={
-                        "did": device_did,
-                        "pub": device_pub_b64,
-                        "meta": client_meta
-                    }
-                )
-                start_res.raise_for_status()
-                session_id = start_res.json()["session_id"]
+                # 1. Start (or resume) Session
+                start_req = {
+                    "device_did": device_did,
+                    "device_pub_b64": device_pub_b64,
+                    "expected_total_bytes": expected_total_bytes,
+                    "expected_total_items": expected_total_items,
+                    "client_meta": client_meta
+                }
+                session_id, chunk_size, acked = await self._start_session(client, start_req)
 
                 # 2. Chunk and Upload
-                jsonl_data = "\n".join([json.dumps({"token": t}) for t in tokens]).encode("utf-8")
+                uploaded_count = 0
                 total_bytes = 0
-                
-                max_size = self.config["max_chunk_bytes"]
-                chunks = [jsonl_data[i:i + max_size] for i in range(0, len(jsonl_data), max_size)]
-                
-                for i, chunk in enumerate(chunks):
-                    upload_res = await client.post(
-                        f"{self.config['base_url']}/sync/upload",
-                        content=chunk,
-                        headers={
-                            "X-Session-ID": session_id,
-                            "X-Chunk-Index": str(i),
-                            "Content-Type": "application/octet-stream"
-                        }
-                    )
-                    upload_res.raise_for_status()
-                    total_bytes += len(chunk)
+                stream_hash = hashlib.sha256()
+
+                async def upload(acked: Dict[int, Optional[str]]) -> Tuple[int, int]:
+                    nonlocal uploaded_count, total_bytes, stream_hash
+                    uploaded_count = total_bytes = 0
+                    stream_hash = hashlib.sha256()
+
+                    async def jsonl_lines() -> AsyncIterator[bytes]:
+                        nonlocal uploaded_count
+                        async for t in _aiter_tokens(tokens):
+                            line = json.dumps({"token": t}).encode("utf-8")
+                            yield line if uploaded_count == 0 else b"\n" + line
+                            uploaded_count += 1
+
+                    async def hashed_chunks() -> AsyncIterator[bytes]:
+                        nonlocal total_bytes
+                        async for chunk in iter_jsonl_chunks(jsonl_lines(), chunk_size):
+                            stream_hash.update(chunk)
+                            total_bytes += len(chunk)
+                            yield chunk
+
+                    return await self._upload_chunks(client, session_id, hashed_chunks(), acked)
+
+                skipped, sent = await upload(acked)
+                if any(seq >= sent for seq in acked):
+                    # Chunks past our end: the session was opened for a different backlog
+                    session_id, chunk_size, _ = await self._start_session(client, {**start_req, "restart": True})
+                    if isinstance(tokens, (Iterator, AsyncIterator)):
+                        raise Exception("Resumed session held chunks of an older backlog; it was restarted, sync again")
+                    skipped, _ = await upload({})
 
                 # 3. Commit
-                final_hash = base64.b64encode(hashlib.sha256(jsonl_data).digest()).decode("utf-8")
                 commit_res = await client.post(
-                    f"{self.config['base_url']}/sync/commit",
+                    self._url(f"/{session_id}/commit"),
                     json={
-                        "session_id": session_id,
-                        "final_hash": final_hash,
+                        "final_hash_b64": b64url_encode(stream_hash.digest()),
+                        "format": "tokens-jsonl",
                         "allow_expired": allow_expired
                     }
                 )
                 commit_res.raise_for_status()
+                result = commit_res.json()
 
                 return {
                     "success": True,
-                    "uploaded_count": len(tokens),
+                    "uploaded_count": uploaded_count,
                     "total_bytes": total_bytes,
                     "session_id": session_id,
+                    "skipped_chunks": skipped,
+                    "inserted": result.get("inserted"),
+                    "duplicates": result.get("duplicates"),
+                    "invalid": result.get("invalid"),
                     "error": None
                 }
 
@@ -92,6 +175,124 @@ class OESPSyncClient:
                     "success": False,
                     "uploaded_count": 0,
                     "total_bytes": 0,
-                    "session_id": None,
+                    "session_id": session_id,
+                    "skipped_chunks": 0,
+                    "inserted": None,
+                    "duplicates": None,
+                    "invalid": None,
                     "error": str(e)
                 }
+
+    async def _start_session(
+        self, client: httpx.AsyncClient, start_req: Dict[str, Any]
+    ) -> Tuple[str, int, Dict[int, Optional[str]]]:
+        """Start or resume a session; return its id, the chunk size and the chunks it holds."""
+        start_res = await client.post(self._url("/start"), json=start_req)
+        start_res.raise_for_status()
+        start = start_res.json()
+        session_id = str(start["session_id"])
+        chunk_size = min(self.config["max_chunk_bytes"], start.get("max_chunk_bytes") or self.config["max_chunk_bytes"])
+
+        acked: Dict[int, Optional[str]] = {}
+        if start.get("resume", {}).get("acked_chunks", 0) > 0:
+            acked = await self._fetch_acked(client, session_id)
+        return session_id, chunk_size, acked
+
+    async def _fetch_acked(self, client: httpx.AsyncClient, session_id: str) -> Dict[int, Optional[str]]:
+        """Return the seqs the server already holds for a session, with their SHA-256 (base64url).
+
+        Hashes are None for servers that do not report them.
+        """
+        res = await client.get(self._url(f"/{session_id}/status"))
+        res.raise_for_status()
+        status = res.json()
+        if "chunks" in status:
+            return {c["seq"]: c["sha256"] for c in status["chunks"]}
+        if "acked_seqs" in status:
+            return dict.fromkeys(status["acked_seqs"])
+        # Older servers: only a contiguous prefix can be inferred safely
+        last, count = status.get("last_acked_seq", -1), status.get("acked_chunks", 0)
+        return dict.fromkeys(range(last + 1)) if count == last + 1 else {}
+
+    async def _upload_chunks(
+        self,
+        client: httpx.AsyncClient,
+        session_id: str,
+        chunks: AsyncIterator[bytes],
+        acked: Dict[int, Optional[str]]
+    ) -> Tuple[int, int]:
+        """Upload chunks keeping up to `upload_window` requests in flight.
+
+        Seqs in `acked` are skipped when the stored hash matches (or is
+        unknown). Returns (skipped, total) chunk counts once every seq is
+        acknowledged; the first chunk that still fails after its retries
+        aborts the remaining uploads.
+        """
+        window = max(1, self.config["upload_window"])
+        in_flight: Set[asyncio.Task] = set()
+        skipped = 0
+        try:
+            seq = 0
+            async for chunk in chunks:
+                if seq in acked:
+                    stored = acked[seq]
+                    if stored is None or stored == b64url_encode(hashlib.sha256(chunk).digest()):
+                        skipped += 1
+                        seq += 1
+                        continue
+                if len(in_flight) >= window:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                in_flight.add(asyncio.create_task(self._upload_chunk(client, session_id, seq, chunk)))
+                seq += 1
+
+            while in_flight:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            # Let cancelled uploads finish before the HTTP client can be closed
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        return skipped, seq
+
+    async def _send_chunk(self, client: httpx.AsyncClient, session_id: str, seq: int, chunk: bytes, sha256_b64: str) -> httpx.Response:
+        if self.config["binary_chunks"]:
+            return await client.put(
+                self._url(f"/{session_id}/chunk/{seq}"),
+                content=chunk,
+                headers={
+                    "Content-Type": "application/octet-stream",
+                    "X-OESP-CHUNK-SHA256": sha256_b64
+                }
+            )
+        return await client.post(
+            self._url(f"/{session_id}/chunk"),
+            json={
+                "seq": seq,
+                "payload_b64": b64url_encode(chunk),
+                "sha256_b64": sha256_b64
+            }
+        )
+
+    async def _upload_chunk(self, client: httpx.AsyncClient, session_id: str, seq: int, chunk: bytes) -> None:
+        sha256_b64 = b64url_encode(hashlib.sha256(chunk).digest())
+        for attempt in range(self.config["max_retries"] + 1):
+            try:
+                upload_res = await self._send_chunk(client, session_id, seq, chunk, sha256_b64)
+                upload_res.raise_for_status()
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, httpx.TransportError) or e.response.status_code >= 500
+                if not retryable or attempt == self.config["max_retries"]:
+                    raise
+            await asyncio.sleep(min(0.5 * (2 ** attempt), 5.0))
+            # The chunk may have been stored before the connection dropped
+            try:
+                held = await self._fetch_acked(client, session_id)
+                if seq in held and held[seq] in (None, sha256_b64):
+                    return
+            except (httpx.TransportError, httpx.HTTPStatusError):
+                pass
@@ -6,12 +6,18 @@ class SyncConfig(TypedDict):
     api_key: Optional[str]
     timeout_sec: float
     max_chunk_bytes: int
+    upload_window: int
+    max_retries: int
+    binary_chunks: bool
 
 def get_sync_config(
     base_url: Optional[str] = None,
     api_key: Optional[str] = None,
     timeout_sec: float = 30.0,
-    max_chunk_bytes: int = 500000
+    max_chunk_bytes: int = 500000,
+    upload_window: int = 4,
+    max_retries: int = 3,
+    binary_chunks: bool = True
 ) -> SyncConfig:
     default_base_url = "http://oesp-sync-server:8000"
     env_base_url = os.environ.get("OESP_SYNC_BASE_URL")
@@ -20,5 +26,8 @@ def get_sync_config(
         "base_url": base_url or env_base_url or default_base_url,
         "api_key": api_key,
         "timeout_sec": timeout_sec,
-        "max_chunk_bytes": max_chunk_bytes
+        "max_chunk_bytes": max_chunk_bytes,
+        "upload_window": upload_window,
+        "max_retries": max_retries,
+        "binary_chunks": binary_chunks
     }
@@ -7,6 +7,7 @@ from .frames import (
 from .transport import OESPBleGattTransport
 from .link import BleGattLink
 from .bleak_link import BleakGattLink
+from .sim_link import SimulatedGattLink
 
 __all__ = [
     "OESP_BLE_SERVICE_UUID",
@@ -15,5 +16,6 @@ __all__ = [
     "OESP_BLE_CHAR_META_UUID",
     "OESPBleGattTransport",
     "BleGattLink",
-    "BleakGattLink"
+    "BleakGattLink",
+    "SimulatedGattLink",
 ]
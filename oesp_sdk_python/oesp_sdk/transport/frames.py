@@ -1,4 +1,8 @@
-from typing import Literal, TypedDict, Union, Optional, List, Dict, Any
+import base64
+import hashlib
+import json
+import struct
+from typing import Literal, TypedDict, NotRequired, Union, Optional, List, Dict, Any
 
 OESP_BLE_SERVICE_UUID = "e95f1234-5678-4321-8765-abcdef012345"
 OESP_BLE_CHAR_RX_UUID = "e95f1235-5678-4321-8765-abcdef012345"  # Central -> Peripheral (Write)
@@ -14,26 +18,132 @@ class BaseFrame(TypedDict):
 class HelloFrame(BaseFrame):
     ver: int
     did: str
-    caps: Dict[str, Any]
+    caps: Dict[str, Any]  # maxChunk, mtuHint, window (chunks accepted in flight), binary, batch
 
 class StartFrame(BaseFrame):
     mid: str
     totalLen: int
     parts: int
     sha256: str
+    chunk: NotRequired[int]  # size of every chunk but the last; lets the receiver write in place
+    items: NotRequired[int]  # batch of tokens, each prefixed with its u32 length (send_tokens)
 
 class ChunkFrame(BaseFrame):
     seq: int
-    data: str  # Base64
+    data: str  # Base64 on the JSON wire; raw bytes once decoded by decode_frame
 
 class EndFrame(BaseFrame):
     pass
 
 class AckFrame(BaseFrame):
-    ack: int
+    ack: int  # cumulative: every seq <= ack received; -1 for START/END
 
 class NackFrame(BaseFrame):
-    at: int
+    at: int  # first missing seq, or -1 for END
     reason: Literal["BAD_HASH", "TIMEOUT", "BAD_SEQ", "UNKNOWN"]
 
 OESPBleFrame = Union[HelloFrame, StartFrame, ChunkFrame, EndFrame, AckFrame, NackFrame]
+
+# Binary framing, negotiated through HELLO caps ({"binary": true}); HELLO itself stays JSON.
+# Header: type (1, high bit set so it never starts with '{'), sid (4), seq (u32), payload length (u16)
+BIN_HEADER = struct.Struct(">B4sIH")
+BIN_HEADER_SIZE = BIN_HEADER.size
+# ATT write/notify opcode + handle
+ATT_OVERHEAD = 3
+
+_TYPE_CODES = {"START": 0x81, "CHUNK": 0x82, "END": 0x83, "ACK": 0x84, "NACK": 0x85}
+_CODE_TYPES = {code: t for t, code in _TYPE_CODES.items()}
+# START of a token batch; its payload carries the item count after the chunk size
+_BATCH_START = 0x86
+_NO_SEQ = 0xFFFFFFFF
+# START payload: totalLen (u32), chunk size (u16), raw sha256, then the mid as UTF-8
+_START_BODY = struct.Struct(">IH32s")
+_BATCH_START_BODY = struct.Struct(">IHI32s")
+# Length prefix of each token in a batch body
+BATCH_RECORD_HEADER = struct.Struct(">I")
+
+def wire_sid(sid: str) -> str:
+    """Session id as carried by binary frames: 8 hex chars (4 bytes)."""
+    if len(sid) == 8:
+        try:
+            bytes.fromhex(sid)
+            return sid.lower()
+        except ValueError:
+            pass
+    return hashlib.blake2b(sid.encode("utf-8"), digest_size=4).hexdigest()
+
+def binary_chunk_size(mtu: int) -> int:
+    """CHUNK payload that fills one ATT packet at this MTU."""
+    return mtu - ATT_OVERHEAD - BIN_HEADER_SIZE
+
+def encode_frame(frame: Dict[str, Any], binary: bool = False) -> bytes:
+    """Encode a frame dict; CHUNK `data` is raw bytes in both framings."""
+    t = frame["t"]
+    if not binary or t == "HELLO":
+        if t == "CHUNK":
+            frame = dict(frame, data=base64.b64encode(frame["data"]).decode("utf-8"))
+        return json.dumps(frame).encode("utf-8")
+
+    code = _TYPE_CODES.get(t)
+    if t == "START":
+        seq = frame["parts"]
+        sha = base64.b64decode(frame["sha256"])
+        if "items" in frame:
+            code = _BATCH_START
+            body = _BATCH_START_BODY.pack(frame["totalLen"], frame.get("chunk", 0), frame["items"], sha)
+        else:
+            body = _START_BODY.pack(frame["totalLen"], frame.get("chunk", 0), sha)
+        payload = body + frame["mid"].encode("utf-8")
+    elif t == "CHUNK":
+        seq, payload = frame["seq"], frame["data"]
+    elif t == "END":
+        seq, payload = _NO_SEQ, b""
+    elif t == "ACK":
+        seq, payload = frame["ack"] & _NO_SEQ, b""
+    elif t == "NACK":
+        seq, payload = frame["at"] & _NO_SEQ, frame["reason"].encode("ascii")
+    else:
+        raise ValueError(f"Unknown frame type: {t}")
+    return BIN_HEADER.pack(code, bytes.fromhex(frame["sid"]), seq, len(payload)) + payload
+
+def decode_frame(data: bytes) -> Dict[str, Any]:
+    """Decode a JSON or binary frame into a frame dict (CHUNK `data` as bytes)."""
+    if not data or not data[0] & 0x80:
+        frame = json.loads(bytes(data).decode("utf-8"))
+        if frame.get("t") == "CHUNK":
+            frame["data"] = base64.b64decode(frame["data"])
+        return frame
+
+    code, sid_raw, seq, length = BIN_HEADER.unpack_from(data)
+    payload = bytes(data[BIN_HEADER_SIZE:])
+    if len(payload) != length:
+        raise ValueError(f"Binary frame length mismatch: {len(payload)} != {length}")
+    t = "START" if code == _BATCH_START else _CODE_TYPES.get(code)
+    if t is None:
+        raise ValueError(f"Unknown binary frame type: {code:#x}")
+    sid = sid_raw.hex()
+    signed = -1 if seq == _NO_SEQ else seq
+
+    if t == "START":
+        if code == _BATCH_START:
+            total_len, chunk, items, sha = _BATCH_START_BODY.unpack_from(payload)
+            mid = payload[_BATCH_START_BODY.size:]
+        else:
+            total_len, chunk, sha = _START_BODY.unpack_from(payload)
+            items, mid = None, payload[_START_BODY.size:]
+        start = {
+            "t": t, "sid": sid, "mid": mid.decode("utf-8"),
+            "totalLen": total_len, "parts": seq, "sha256": base64.b64encode(sha).decode("utf-8"),
+        }
+        if items is not None:
+            start["items"] = items
+        if chunk:
+            start["chunk"] = chunk
+        return start
+    if t == "CHUNK":
+        return {"t": t, "sid": sid, "seq": seq, "data": payload}
+    if t == "END":
+        return {"t": t, "sid": sid}
+    if t == "ACK":
+        return {"t": t, "sid": sid, "ack": signed}
+    return {"t": t, "sid": sid, "at": signed, "reason": payload.decode("ascii")}
@@ -0,0 +1,211 @@
+import base64
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from .frames import BATCH_RECORD_HEADER
+
+class ReassemblyBuffer:
+    """Receive-side state of one transfer.
+
+    Chunks are written in place into a buffer preallocated to `totalLen`, at
+    `seq * chunk_size`. The SHA-256 is fed as the contiguous prefix grows, so
+    END only has to finish the digest.
+
+    A batch transfer (`items` set) carries length-prefixed tokens; complete
+    records are handed out from the contiguous prefix by `take_records`.
+    """
+
+    __slots__ = (
+        "sid", "total_len", "parts", "chunk_size", "expected_sha", "binary",
+        "buf", "received", "count", "next_seq", "nacked_at", "last_activity",
+        "items", "delivered", "_hasher", "_hashed", "_pending", "_parsed",
+    )
+
+    def __init__(
+        self,
+        sid: str,
+        total_len: int,
+        parts: int,
+        sha256_b64: str,
+        chunk_size: Optional[int] = None,
+        binary: bool = False,
+        items: Optional[int] = None,
+    ):
+        if total_len < 0 or parts < 0 or (parts == 0) != (total_len == 0) or parts > total_len:
+            raise ValueError("Invalid transfer size")
+        self.sid = sid
+        self.total_len = total_len
+        self.parts = parts
+        # Senders that do not announce it are inferred from the first non-final chunk
+        self.chunk_size = chunk_size or None
+        if self.chunk_size is not None and not self._size_ok():
+            raise ValueError("Chunk size does not match totalLen/parts")
+        self.expected_sha = sha256_b64
+        self.binary = binary
+        self.buf = bytearray(total_len)
+        self.received = bytearray(parts)
+        self.count = 0
+        self.next_seq = 0
+        self.nacked_at: Optional[int] = None
+        self.last_activity = 0.0
+        self._hasher = hashlib.sha256()
+        self._hashed = 0
+        self._pending: Dict[int, bytes] = {}
+        self.items = items
+        self.delivered = 0
+        self._parsed = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.count == self.parts
+
+    def add(self, seq: int, data: bytes) -> None:
+        """Store one chunk; duplicates are ignored. Raises ValueError on a bad seq or length."""
+        if not 0 <= seq < self.parts:
+            raise ValueError(f"seq {seq} out of range")
+        if self.received[seq]:
+            return
+
+        if self.chunk_size is None:
+            if seq == self.parts - 1:
+                # Final chunk can be shorter: wait for a full one to learn the size
+                self._pending[seq] = bytes(data)
+                self._mark(seq)
+                return
+            # Adopt the size only once it fits: a bad chunk must not poison the session
+            size = len(data)
+            if not self._size_ok(size):
+                raise ValueError("Inconsistent chunk size")
+            for pseq, pdata in self._pending.items():
+                self._check_len(pseq, pdata, size)
+            self._check_len(seq, data, size)
+            self.chunk_size = size
+            for pseq, pdata in self._pending.items():
+                self._write(pseq, pdata)
+            self._pending.clear()
+
+        self._write(seq, data)
+        self._mark(seq)
+
+    def _size_ok(self, size: Optional[int] = None) -> bool:
+        if size is None:
+            size = self.chunk_size
+        return size is not None and size > 0 and (self.parts - 1) * size < self.total_len <= self.parts * size
+
+    def _check_len(self, seq: int, data: bytes, size: int) -> int:
+        start = seq * size
+        expected = size if seq < self.parts - 1 else self.total_len - start
+        if len(data) != expected:
+            raise ValueError(f"Chunk {seq} has {len(data)} bytes, expected {expected}")
+        return start
+
+    def _write(self, seq: int, data: bytes) -> None:
+        start = self._check_len(seq, data, self.chunk_size)
+        self.buf[start:start + len(data)] = data
+
+    def _mark(self, seq: int) -> None:
+        self.received[seq] = 1
+        self.count += 1
+        nxt = self.next_seq
+        while nxt < self.parts and self.received[nxt]:
+            nxt += 1
+        self.next_seq = nxt
+        if self.chunk_size is not None:
+            end = self.total_len if nxt == self.parts else nxt * self.chunk_size
+            if end > self._hashed:
+                self._hasher.update(memoryview(self.buf)[self._hashed:end])
+                self._hashed = end
+
+    def verify(self) -> bool:
+        if not self.complete:
+            return False
+        if self._hashed < self.total_len:
+            # Only possible when the size was never learned (single-chunk transfer)
+            for seq, data in self._pending.items():
+                self.chunk_size = self.chunk_size or self.total_len
+                self._write(seq, data)
+            self._pending.clear()
+            self._hasher.update(memoryview(self.buf)[self._hashed:])
+            self._hashed = self.total_len
+        return base64.b64encode(self._hasher.digest()).decode("utf-8") == self.expected_sha
+
+    def data(self) -> bytes:
+        return bytes(self.buf)
+
+    def take_records(self) -> List[bytes]:
+        """Return the batch records completed since the last call.
+
+        Only the contiguous prefix is parsed. Raises ValueError when a length
+        prefix runs past the transfer, or on the final call (everything
+        received) if the body does not hold exactly `items` records.
+        """
+        records = []
+        buf = self.buf
+        end = self._hashed
+        pos = self._parsed
+        header = BATCH_RECORD_HEADER.size
+        while pos + header <= end:
+            (length,) = BATCH_RECORD_HEADER.unpack_from(buf, pos)
+            stop = pos + header + length
+            if stop > self.total_len:
+                raise ValueError("Batch record overruns the transfer")
+            if stop > end:
+                break
+            records.append(bytes(buf[pos + header:stop]))
+            pos = stop
+        self._parsed = pos
+        self.delivered += len(records)
+        if end == self.total_len and (pos != end or self.delivered != self.items):
+            raise ValueError(f"Batch holds {self.delivered} records, expected {self.items}")
+        return records
+
+class SessionTable:
+    """Bounded table of in-progress transfers keyed by sid.
+
+    Sessions idle for more than `timeout_sec` are expired; when the table is
+    full, opening a new session evicts the least recently active one.
+    """
+
+    def __init__(self, max_sessions: int = 8, timeout_sec: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.max_sessions = max_sessions
+        self.timeout_sec = timeout_sec
+        self.clock = clock
+        self._sessions: "OrderedDict[str, ReassemblyBuffer]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._sessions
+
+    def get(self, sid: str) -> Optional[ReassemblyBuffer]:
+        session = self._sessions.get(sid)
+        if session is not None:
+            session.last_activity = self.clock()
+            self._sessions.move_to_end(sid)
+        return session
+
+    def open(self, session: ReassemblyBuffer) -> List[ReassemblyBuffer]:
+        """Add a session; return the sessions evicted to make room."""
+        session.last_activity = self.clock()
+        evicted = []
+        while len(self._sessions) >= self.max_sessions:
+            evicted.append(self._sessions.popitem(last=False)[1])
+        self._sessions[session.sid] = session
+        return evicted
+
+    def pop(self, sid: str) -> Optional[ReassemblyBuffer]:
+        return self._sessions.pop(sid, None)
+
+    def expire(self) -> List[ReassemblyBuffer]:
+        """Drop and return sessions idle for longer than the timeout."""
+        deadline = self.clock() - self.timeout_sec
+        expired = []
+        # Ordered by activity: stop at the first live session
+        while self._sessions:
+            sid, session = next(iter(self._sessions.items()))
+            if session.last_activity > deadline:
+                break
+            expired.append(self._sessions.pop(sid))
+        return expired
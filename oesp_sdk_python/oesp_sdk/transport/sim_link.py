@@ -0,0 +1,123 @@
+import asyncio
+import math
+import random
+from typing import Callable, Dict, Optional, Tuple
+from .frames import ATT_OVERHEAD
+
+class SimulatedGattLink:
+    """In-process end of a simulated BLE GATT link, for tests and benchmarks.
+
+    `write_rx` behaves as a write-with-response: it returns after
+    `write_latency_ms` (+ up to `jitter_ms`), plus one connection interval per
+    extra ATT packet when the frame does not fit in MTU - 3 bytes. The frame
+    reaches the peer's notify callback at the next connection event, unless
+    dropped (`drop_prob`) or held back for one to two extra intervals so later
+    frames overtake it (`reorder_prob`).
+    """
+
+    def __init__(
+        self,
+        mtu: int = 185,
+        conn_interval_ms: float = 15.0,
+        write_latency_ms: float = 15.0,
+        jitter_ms: float = 0.0,
+        drop_prob: float = 0.0,
+        reorder_prob: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        if mtu <= ATT_OVERHEAD:
+            raise ValueError(f"MTU must be larger than {ATT_OVERHEAD}")
+        self.mtu = mtu
+        self.conn_interval = conn_interval_ms / 1000.0
+        self.write_latency = write_latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.drop_prob = drop_prob
+        self.reorder_prob = reorder_prob
+        self.rng = random.Random(seed)
+        self.peer: Optional["SimulatedGattLink"] = None
+        self.connected = False
+        self._cb: Optional[Callable[[bytes], None]] = None
+        self._writes = 0
+        self._bytes = 0
+        self._packets = 0
+        self._dropped = 0
+        self._reordered = 0
+
+    @classmethod
+    def pair(
+        cls,
+        mtu: int = 185,
+        conn_interval_ms: float = 15.0,
+        write_latency_ms: float = 15.0,
+        jitter_ms: float = 0.0,
+        drop_prob: float = 0.0,
+        reorder_prob: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> Tuple["SimulatedGattLink", "SimulatedGattLink"]:
+        """Two connected ends sharing the same link parameters."""
+        rng = random.Random(seed)
+        a, b = (
+            cls(mtu, conn_interval_ms, write_latency_ms, jitter_ms, drop_prob, reorder_prob, rng.random())
+            for _ in range(2)
+        )
+        a.peer, b.peer = b, a
+        a.connected = b.connected = True
+        return a, b
+
+    async def connect(self, device_id: str) -> None:
+        self.connected = True
+
+    async def disconnect(self) -> None:
+        self.connected = False
+
+    async def start_notify(self) -> None:
+        pass
+
+    async def get_mtu_hint(self) -> Optional[int]:
+        return self.mtu
+
+    def on_tx_notify(self, cb: Callable[[bytes], None]) -> None:
+        self._cb = cb
+
+    async def write_rx(self, data: bytes) -> None:
+        if not self.connected or self.peer is None:
+            raise ConnectionError("Simulated link is not connected")
+        data = bytes(data)
+        packets = max(1, math.ceil(len(data) / (self.mtu - ATT_OVERHEAD)))
+        self._writes += 1
+        self._bytes += len(data)
+        self._packets += packets
+
+        # Long writes need one exchange per extra packet
+        await asyncio.sleep(self.write_latency + (packets - 1) * self.conn_interval + self._jitter())
+
+        if self.rng.random() < self.drop_prob:
+            self._dropped += 1
+            return
+        delay = self._until_next_event() + self._jitter()
+        if self.rng.random() < self.reorder_prob:
+            self._reordered += 1
+            delay += max(self.conn_interval, 0.001) * (1 + self.rng.random())
+        asyncio.get_running_loop().call_later(delay, self.peer._deliver, data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "writes": self._writes,
+            "bytes": self._bytes,
+            "packets": self._packets,
+            "dropped": self._dropped,
+            "reordered": self._reordered,
+        }
+
+    def _jitter(self) -> float:
+        return self.rng.uniform(0.0, self.jitter) if self.jitter else 0.0
+
+    def _until_next_event(self) -> float:
+        if not self.conn_interval:
+            return 0.0
+        now = asyncio.get_running_loop().time()
+        return self.conn_interval - now % self.conn_interval
+
+    def _deliver(self, data: bytes) -> None:
+        if self.connected and self._cb is not None:
+            self._cb(data)
@@ -1,130 +1,422 @@
-import json
 import base64
 import hashlib
 import asyncio
 import secrets
-from typing import List, Callable, Optional, Set, Dict, Any
+from collections import deque
+from typing import List, Callable, Iterable, Optional, Set, Dict, Any, Tuple
 from .link import BleGattLink
-from .frames import OESPBleFrame, StartFrame, ChunkFrame, AckFrame, NackFrame
+from .frames import (
+    OESPBleFrame, HelloFrame, StartFrame, ChunkFrame, AckFrame, NackFrame,
+    encode_frame, decode_frame, wire_sid, binary_chunk_size, BATCH_RECORD_HEADER,
+)
+from .reassembly import ReassemblyBuffer, SessionTable
+
+# Out-of-order chunks a receiver accepts per session; advertised in HELLO caps
+MAX_WINDOW = 64
+
+# Completed sids remembered so a retransmitted END is re-acknowledged
+_COMPLETED_SIDS = 32
 
 class OESPBleGattTransport:
-    def __init__(self, max_chunk_bytes: int = 1024, timeout_ms: int = 3000, retries: int = 3):
+    def __init__(
+        self,
+        max_chunk_bytes: int = 1024,
+        timeout_ms: int = 3000,
+        retries: int = 3,
+        window: int = 1,
+        binary: bool = False,
+        max_sessions: int = 8,
+        session_timeout_ms: int = 30000,
+        max_token_bytes: int = 1 << 20,
+    ):
         self.max_chunk_bytes = max_chunk_bytes
         self.timeout_sec = timeout_ms / 1000.0
         self.retries = retries
-        self._ack_events: Dict[str, asyncio.Event] = {}
-        self._last_ack: Dict[str, int] = {}
+        # Chunks kept in flight; above 1 the window is negotiated with the peer through HELLO
+        self.window = max(1, window)
+        # Binary frames sized to the MTU, also negotiated through HELLO
+        self.binary = binary
+        # Receiver limits: concurrent transfers per link, idle timeout, token size
+        self.max_sessions = max_sessions
+        self.session_timeout_sec = session_timeout_ms / 1000.0
+        self.max_token_bytes = max_token_bytes
+        self.did = ""
+        # Per-sid queues of ("ACK", ack, None) / ("NACK", at, reason) for senders awaiting replies
+        self._ack_queues: Dict[str, asyncio.Queue] = {}
+        self._hello_waiters: Dict[str, asyncio.Future] = {}
+        self._peer_caps: Dict[BleGattLink, Dict[str, Any]] = {}
+        self.reset_stats()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters since creation or the last `reset_stats()`.
+
+        `round_trips` counts the times a sender had to wait for the peer;
+        `retries` counts retransmitted frames.
+        """
+        return {
+            "frames_sent": self._frames_sent,
+            "bytes_sent": self._bytes_sent,
+            "round_trips": self._round_trips,
+            "retries": self._retries,
+            "tokens_sent": self._tokens_sent,
+            "tokens_received": self._tokens_received,
+        }
+
+    def reset_stats(self) -> None:
+        self._frames_sent = 0
+        self._bytes_sent = 0
+        self._round_trips = 0
+        self._retries = 0
+        self._tokens_sent = 0
+        self._tokens_received = 0
+
+    async def _write(self, link: BleGattLink, data: bytes) -> None:
+        self._frames_sent += 1
+        self._bytes_sent += len(data)
+        await link.write_rx(data)
+
+    def _caps(self, mtu: Optional[int]) -> Dict[str, Any]:
+        caps: Dict[str, Any] = {"maxChunk": self.max_chunk_bytes, "window": MAX_WINDOW, "binary": True, "batch": True}
+        if mtu:
+            caps["mtuHint"] = mtu
+        return caps
+
+    async def negotiate(self, link: BleGattLink) -> Dict[str, Any]:
+        """Exchange HELLO with the peer and return its caps ({} if it does not answer)."""
+        if link in self._peer_caps:
+            return self._peer_caps[link]
+        sid = secrets.token_hex(4)
+        mtu = await link.get_mtu_hint()
+        hello: HelloFrame = {"t": "HELLO", "sid": sid, "ver": 1, "did": self.did, "caps": self._caps(mtu)}
+        waiter = asyncio.get_running_loop().create_future()
+        self._hello_waiters[sid] = waiter
+        try:
+            await self._write(link, encode_frame(hello))
+            self._round_trips += 1
+            caps = await asyncio.wait_for(waiter, timeout=self.timeout_sec)
+        except asyncio.TimeoutError:
+            # Peers without HELLO support only do stop-and-wait
+            caps = {}
+        finally:
+            self._hello_waiters.pop(sid, None)
+        self._peer_caps[link] = caps
+        return caps
 
     async def send_token(self, token: str, link: BleGattLink, sid: Optional[str] = None) -> None:
+        window, binary, chunk_size = await self._transfer_params(link)
+        await self._send_payload(link, sid, token.encode("utf-8"), window, binary, chunk_size)
+        self._tokens_sent += 1
+
+    async def send_tokens(self, tokens: Iterable[str], link: BleGattLink) -> None:
+        """Send many tokens in as few transfers as possible.
+
+        Tokens are packed into one length-prefixed body (u32 length + UTF-8
+        token) under a single START/END and hash, split only to stay under
+        `max_token_bytes`. Peers that do not advertise `batch` in HELLO get
+        one transfer per token.
+        """
+        records = [token.encode("utf-8") for token in tokens]
+        if not records:
+            return
+        caps = await self.negotiate(link)
+        window, binary, chunk_size = await self._transfer_params(link)
+        if not caps.get("batch"):
+            for record in records:
+                await self._send_payload(link, None, record, window, binary, chunk_size)
+                self._tokens_sent += 1
+            return
+
+        header = BATCH_RECORD_HEADER.size
+        batch: List[bytes] = []
+        size = 0
+        for record in records:
+            if batch and size + header + len(record) > self.max_token_bytes:
+                await self._send_batch(link, batch, window, binary, chunk_size)
+                batch, size = [], 0
+            batch.append(record)
+            size += header + len(record)
+        await self._send_batch(link, batch, window, binary, chunk_size)
+
+    async def _send_batch(
+        self, link: BleGattLink, records: List[bytes], window: int, binary: bool, chunk_size: int
+    ) -> None:
+        pack = BATCH_RECORD_HEADER.pack
+        body = b"".join(pack(len(record)) + record for record in records)
+        await self._send_payload(link, None, body, window, binary, chunk_size, items=len(records))
+        self._tokens_sent += len(records)
+
+    async def _transfer_params(self, link: BleGattLink) -> Tuple[int, bool, int]:
+        """Window, framing and chunk size for transfers to this peer."""
+        window = 1
+        binary = False
+        chunk_size = self.max_chunk_bytes
+        if self.window > 1 or self.binary:
+            caps = await self.negotiate(link)
+            window = max(1, min(self.window, int(caps.get("window", 1))))
+            binary = self.binary and bool(caps.get("binary"))
+        if binary:
+            mtu = await link.get_mtu_hint()
+            peer_mtu = caps.get("mtuHint")
+            if mtu and peer_mtu:
+                mtu = min(mtu, int(peer_mtu))
+            if mtu:
+                # One CHUNK frame per ATT packet
+                chunk_size = max(1, min(self.max_chunk_bytes, binary_chunk_size(mtu)))
+        return window, binary, chunk_size
+
+    async def _send_payload(
+        self,
+        link: BleGattLink,
+        sid: Optional[str],
+        payload: bytes,
+        window: int,
+        binary: bool,
+        chunk_size: int,
+        items: Optional[int] = None,
+    ) -> None:
         if not sid:
             sid = secrets.token_hex(4)
-            
-        token_bytes = token.encode("utf-8")
-        sha256_hash = hashlib.sha256(token_bytes).digest()
+        if binary:
+            sid = wire_sid(sid)
+
+        sha256_hash = hashlib.sha256(payload).digest()
         sha256_b64 = base64.b64encode(sha256_hash).decode("utf-8")
-        
-        chunks = [token_bytes[i:i + self.max_chunk_bytes] for i in range(0, len(token_bytes), self.max_chunk_bytes)]
-        
-        # 1. Send START
-        start_frame: StartFrame = {
-            "t": "START",
-            "sid": sid,
-            "mid": secrets.token_hex(4),
-            "totalLen": len(token_bytes),
-            "parts": len(chunks),
-            "sha256": sha256_b64
-        }
-        await self._send_frame_with_ack(link, start_frame, -1)
 
-        # 2. Send CHUNKS
-        for i, chunk in enumerate(chunks):
-            chunk_frame: ChunkFrame = {
-                "t": "CHUNK",
+        chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+
+        self._ack_queues[sid] = asyncio.Queue()
+        try:
+            # 1. Send START
+            start_frame: StartFrame = {
+                "t": "START",
                 "sid": sid,
-                "seq": i,
-                "data": base64.b64encode(chunk).decode("utf-8")
+                "mid": secrets.token_hex(4),
+                "totalLen": len(payload),
+                "parts": len(chunks),
+                "sha256": sha256_b64,
+                "chunk": chunk_size,
             }
-            await self._send_frame_with_ack(link, chunk_frame, i)
+            if items is not None:
+                start_frame["items"] = items
+            await self._send_frame_with_ack(link, start_frame, -1, binary)
 
-        # 3. Send END
-        await self._send_frame_with_ack(link, {"t": "END", "sid": sid}, -1)
+            # 2. Send CHUNKS
+            chunk_frames = [
+                encode_frame({"t": "CHUNK", "sid": sid, "seq": i, "data": chunk}, binary)
+                for i, chunk in enumerate(chunks)
+            ]
+            if window > 1:
+                await self._send_window(link, sid, chunk_frames, window)
+            else:
+                for i, chunk_frame in enumerate(chunk_frames):
+                    await self._send_encoded_with_ack(link, sid, "CHUNK", chunk_frame, i)
+
+            # 3. Send END
+            await self._send_frame_with_ack(link, {"t": "END", "sid": sid}, -1, binary)
+        finally:
+            self._ack_queues.pop(sid, None)
+
+    async def _send_window(self, link: BleGattLink, sid: str, encoded: List[bytes], window: int) -> None:
+        """Keep up to `window` chunks in flight; the receiver's ACKs are cumulative."""
+        queue = self._ack_queues[sid]
+        acked = -1
+        next_seq = 0
+        attempts = 0
+
+        while acked < len(encoded) - 1:
+            while next_seq < len(encoded) and next_seq <= acked + window:
+                await self._write(link, encoded[next_seq])
+                next_seq += 1
+
+            if queue.empty():
+                self._round_trips += 1
+            try:
+                kind, n, reason = await asyncio.wait_for(queue.get(), timeout=self.timeout_sec)
+            except asyncio.TimeoutError:
+                attempts += 1
+                if attempts >= self.retries:
+                    raise Exception(f"Failed to send CHUNK {acked + 1} after {self.retries} retries")
+                # Nothing heard: resend the oldest unacknowledged chunk
+                self._retries += 1
+                await self._write(link, encoded[acked + 1])
+                continue
+
+            if kind == "ACK" and n > acked:
+                acked = n
+                attempts = 0
+            elif kind == "NACK" and (reason == "TIMEOUT" or n == -1):
+                # The receiver dropped the session: resending chunks cannot help
+                raise Exception(f"Peer aborted the transfer: {reason}")
+            elif kind == "NACK" and acked < n < next_seq:
+                # Gap reported by the receiver: resend only the missing chunk
+                self._retries += 1
+                await self._write(link, encoded[n])
 
     async def receive_loop(self, link: BleGattLink, on_token: Callable[[str], None]):
-        current_session = None
+        # Concurrent transfers on this link, keyed by sid
+        sessions = SessionTable(self.max_sessions, self.session_timeout_sec)
+        completed: deque = deque(maxlen=_COMPLETED_SIDS)
+
+        def send_ack(sid: str, ack: int, binary: bool):
+            asyncio.create_task(self._send_ack(link, sid, ack, binary))
+
+        def send_nack(sid: str, at: int, reason: str, binary: bool):
+            asyncio.create_task(self._send_nack(link, sid, at, reason, binary))
+
+        def drop(session: ReassemblyBuffer):
+            # Tell a sender that may still be there that its transfer is gone
+            send_nack(session.sid, session.next_seq, "TIMEOUT", session.binary)
+
+        def deliver(session: ReassemblyBuffer) -> bool:
+            # Batch tokens go out as soon as their record is contiguous; each one is
+            # signed, so corruption caught by the END hash is also caught downstream
+            try:
+                records = session.take_records()
+            except ValueError:
+                sessions.pop(session.sid)
+                send_nack(session.sid, -1, "BAD_SEQ", session.binary)
+                return False
+            for record in records:
+                self._tokens_received += 1
+                on_token(record.decode("utf-8"))
+            return True
 
         def handle_notify(data: bytes):
-            nonlocal current_session
             try:
-                frame: OESPBleFrame = json.loads(data.decode("utf-8"))
+                binary = bool(data) and bool(data[0] & 0x80)
+                frame: OESPBleFrame = decode_frame(data)
                 t = frame["t"]
                 sid = frame["sid"]
 
-                if t == "ACK":
-                    self._last_ack[sid] = frame["ack"]
-                    if sid in self._ack_events:
-                        self._ack_events[sid].set()
+                if t in ("ACK", "NACK"):
+                    queue = self._ack_queues.get(sid)
+                    if queue is not None:
+                        if t == "ACK":
+                            queue.put_nowait(("ACK", frame["ack"], None))
+                        else:
+                            queue.put_nowait(("NACK", frame["at"], frame.get("reason")))
                     return
 
+                if t == "HELLO":
+                    waiter = self._hello_waiters.get(sid)
+                    if waiter is not None:
+                        if not waiter.done():
+                            waiter.set_result(frame.get("caps") or {})
+                    else:
+                        # HELLO from the peer: answer on the same sid with our caps
+                        self._peer_caps[link] = frame.get("caps") or {}
+                        asyncio.create_task(self._reply_hello(link, sid))
+                    return
+
+                for session in sessions.expire():
+                    drop(session)
+
                 if t == "START":
-                    current_session = {
-                        "sid": sid,
-                        "expected_sha": frame["sha256"],
-                        "expected_parts": frame["parts"],
-                        "chunks": [None] * frame["parts"],
-                        "received_parts": set()
-                    }
-                    asyncio.create_task(self._send_ack(link, sid, -1))
-                
+                    # A retransmitted START must not drop chunks already received
+                    if sessions.get(sid) is None:
+                        if frame["totalLen"] > self.max_token_bytes:
+                            send_nack(sid, -1, "UNKNOWN", binary)
+                            return
+                        try:
+                            session = ReassemblyBuffer(
+                                sid, frame["totalLen"], frame["parts"], frame["sha256"],
+                                chunk_size=frame.get("chunk"), binary=binary, items=frame.get("items"),
+                            )
+                        except ValueError:
+                            send_nack(sid, -1, "BAD_SEQ", binary)
+                            return
+                        for evicted in sessions.open(session):
+                            drop(evicted)
+                    send_ack(sid, -1, binary)
+
                 elif t == "CHUNK":
-                    if current_session and current_session["sid"] == sid:
-                        seq = frame["seq"]
-                        current_session["chunks"][seq] = base64.b64decode(frame["data"])
-                        current_session["received_parts"].add(seq)
-                        asyncio.create_task(self._send_ack(link, sid, seq))
-                
+                    session = sessions.get(sid)
+                    seq = frame["seq"]
+                    if session is None:
+                        if sid not in completed:
+                            # Expired or evicted: make the sender give up now rather than time out
+                            send_nack(sid, seq, "TIMEOUT", binary)
+                        return
+                    try:
+                        session.add(seq, frame["data"])
+                    except ValueError:
+                        send_nack(sid, seq, "BAD_SEQ", binary)
+                        return
+                    if session.items is not None and not deliver(session):
+                        return
+                    nxt = session.next_seq
+                    # Cumulative ACK: every chunk below `nxt` has arrived
+                    send_ack(sid, nxt - 1, binary)
+                    if seq > nxt and session.nacked_at != nxt:
+                        session.nacked_at = nxt
+                        send_nack(sid, nxt, "BAD_SEQ", binary)
+
                 elif t == "END":
-                    if current_session and current_session["sid"] == sid:
-                        if len(current_session["received_parts"]) == current_session["expected_parts"]:
-                            full_data = b"".join(current_session["chunks"])
-                            actual_sha = base64.b64encode(hashlib.sha256(full_data).digest()).decode("utf-8")
-                            
-                            if actual_sha == current_session["expected_sha"]:
-                                asyncio.create_task(self._send_ack(link, sid, -1))
-                                on_token(full_data.decode("utf-8"))
-                            else:
-                                asyncio.create_task(self._send_nack(link, sid, -1, "BAD_HASH"))
+                    session = sessions.pop(sid)
+                    if session is not None:
+                        if not session.complete:
+                            send_nack(sid, -1, "BAD_SEQ", binary)
+                        elif session.verify():
+                            completed.append(sid)
+                            send_ack(sid, -1, binary)
+                            # Batch tokens were delivered as their chunks arrived
+                            if session.items is None:
+                                self._tokens_received += 1
+                                on_token(session.data().decode("utf-8"))
                         else:
-                            asyncio.create_task(self._send_nack(link, sid, -1, "BAD_SEQ"))
-                        current_session = None
+                            send_nack(sid, -1, "BAD_HASH", binary)
+                    elif sid in completed:
+                        # Our END ACK was lost; the token was already delivered
+                        send_ack(sid, -1, binary)
 
             except Exception as e:
                 print(f"Error handling frame: {e}")
 
         link.on_tx_notify(handle_notify)
 
-    async def _send_frame_with_ack(self, link: BleGattLink, frame: Dict[str, Any], expected_ack: int):
-        sid = frame["sid"]
-        frame_bytes = json.dumps(frame).encode("utf-8")
-        
+    async def _reply_hello(self, link: BleGattLink, sid: str):
+        mtu = await link.get_mtu_hint()
+        reply: HelloFrame = {"t": "HELLO", "sid": sid, "ver": 1, "did": self.did, "caps": self._caps(mtu)}
+        await self._write(link, encode_frame(reply))
+
+    async def _send_frame_with_ack(
+        self, link: BleGattLink, frame: Dict[str, Any], expected_ack: int, binary: bool = False
+    ):
+        await self._send_encoded_with_ack(link, frame["sid"], frame["t"], encode_frame(frame, binary), expected_ack)
+
+    async def _send_encoded_with_ack(
+        self, link: BleGattLink, sid: str, t: str, frame_bytes: bytes, expected_ack: int
+    ):
+        queue = self._ack_queues.setdefault(sid, asyncio.Queue())
+        loop = asyncio.get_running_loop()
+
         for attempt in range(self.retries):
-            self._ack_events[sid] = asyncio.Event()
-            await link.write_rx(frame_bytes)
-            
-            try:
-                await asyncio.wait_for(self._ack_events[sid].wait(), timeout=self.timeout_sec)
-                if self._last_ack.get(sid) == expected_ack:
+            if attempt:
+                self._retries += 1
+            await self._write(link, frame_bytes)
+            self._round_trips += 1
+            deadline = loop.time() + self.timeout_sec
+
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    kind, n, reason = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if kind == "ACK" and n == expected_ack:
                     return
-            except asyncio.TimeoutError:
-                pass
-            finally:
-                self._ack_events.pop(sid, None)
-                
-        raise Exception(f"Failed to send {frame['t']} after {self.retries} retries")
-
-    async def _send_ack(self, link: BleGattLink, sid: str, ack: int):
-        ack_frame = {"t": "ACK", "sid": sid, "ack": ack}
-        await link.write_rx(json.dumps(ack_frame).encode("utf-8"))
-
-    async def _send_nack(self, link: BleGattLink, sid: str, at: int, reason: str):
-        nack_frame = {"t": "NACK", "sid": sid, "at": at, "reason": reason}
-        await link.write_rx(json.dumps(nack_frame).encode("utf-8"))
+                if kind == "NACK" and n == expected_ack:
+                    raise Exception(f"Peer rejected {t}: {reason}")
+                # Stale or out-of-order reply: keep waiting for ours
+
+        raise Exception(f"Failed to send {t} after {self.retries} retries")
+
+    async def _send_ack(self, link: BleGattLink, sid: str, ack: int, binary: bool = False):
+        ack_frame: AckFrame = {"t": "ACK", "sid": sid, "ack": ack}
+        await self._write(link, encode_frame(ack_frame, binary))
+
+    async def _send_nack(self, link: BleGattLink, sid: str, at: int, reason: str, binary: bool = False):
+        nack_frame: NackFrame = {"t": "NACK", "sid": sid, "at": at, "reason": reason}
+        await self._write(link, encode_frame(nack_frame, binary))
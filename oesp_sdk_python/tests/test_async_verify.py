@@ -0,0 +1,68 @@
+import unittest
+from oesp_sdk.client import OESPClient, MemoryKeystore
+from oesp_sdk.core.errors import ReplayError
+from oesp_sdk.core.types import ErrorCode
+from oesp_sdk.server import averify_token, averify_batch
+
+class SelfResolver:
+    def __init__(self, ks):
+        self.ks = ks
+    def resolve_did(self, did):
+        return self.ks.get_x25519_public()
+
+class AsyncMemoryStore:
+    """Minimal AsyncReplayStore without the check_and_mark fast path."""
+    def __init__(self):
+        self.keys = set()
+    async def seen(self, mid, from_did):
+        return (mid, from_did) in self.keys
+    async def mark_seen(self, mid, from_did):
+        self.keys.add((mid, from_did))
+
+class TestAsyncVerify(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        ks = MemoryKeystore()
+        self.client = OESPClient(ks, resolver=SelfResolver(ks))
+        self.did = self.client.get_did()
+
+    async def test_averify_token(self):
+        token = self.client.pack(self.did, {"data": 1})
+        store = AsyncMemoryStore()
+        res = await averify_token(token, replay_store=store)
+        self.assertEqual(res["signer_did"], self.did)
+        with self.assertRaises(ReplayError):
+            await averify_token(token, replay_store=store)
+
+    async def test_averify_batch(self):
+        good1 = self.client.pack(self.did, {"data": 1})
+        good2 = self.client.pack(self.did, {"data": 2})
+        results = await averify_batch([good1, "OESP1.INVALID", good2, good1], replay_store=AsyncMemoryStore())
+        self.assertEqual([r["ok"] for r in results], [True, False, True, False])
+        self.assertEqual(results[1]["error_code"], ErrorCode.INVALID_FORMAT)
+        self.assertEqual(results[3]["error_code"], ErrorCode.REPLAY)
+
+    async def test_sqlalchemy_replay_store(self):
+        try:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            import aiosqlite  # noqa: F401
+        except ImportError:
+            self.skipTest("sqlalchemy[asyncio] and aiosqlite required")
+        from oesp_sdk.server import SqlAlchemyReplayStore
+
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        try:
+            store = SqlAlchemyReplayStore(engine)
+            await store.create_table()
+            self.assertFalse(await store.check_and_mark("m1", "did:a"))
+            self.assertTrue(await store.check_and_mark("m1", "did:a"))
+            self.assertTrue(await store.seen("m1", "did:a"))
+            self.assertEqual(
+                await store.check_and_mark_many([("m2", "did:a"), ("m1", "did:a"), ("m2", "did:a")]),
+                [False, True, True],
+            )
+
+            good = self.client.pack(self.did, {"data": 3})
+            results = await averify_batch([good, good], replay_store=store)
+            self.assertEqual([r["ok"] for r in results], [True, False])
+        finally:
+            await engine.dispose()
@@ -1,3 +1,4 @@
+import pytest
 from oesp_sdk.client import OESPClient, MemoryKeystore
 from oesp_sdk.crypto.rng import DeterministicRNG
 
@@ -35,3 +36,58 @@ def test_full_roundtrip():
     import json
     assert json.loads(decoded["plaintext"]) == body
     assert decoded["from_did"] == client.get_did()
+
+def test_envelope_decodes_fields_once():
+    from oesp_sdk.server.verifier import parse_token
+    from oesp_sdk.core.b64url import decode as b64url_decode
+
+    sender_ks = MemoryKeystore()
+    resolver = SimpleResolver()
+    resolver.add("oesp:did:recipient", MemoryKeystore().get_x25519_public())
+    token = OESPClient(sender_ks, resolver=resolver).pack("oesp:did:recipient", {"msg": "hi"})
+
+    env = parse_token(token)
+    assert not hasattr(env, "__dict__")
+    assert env.ct_bytes == b64url_decode(env.ct)
+    assert env.ct_bytes is env.ct_bytes
+    assert env.sig_bytes is env.sig_bytes
+    assert env.sender.pub_bytes == sender_ks.get_ed25519_public()
+    assert env.canonical is env.canonical
+    assert env.canonical.token_bytes() == b64url_decode(token[len("OESP1."):])
+    assert env == parse_token(token)
+
+def test_pack_many():
+    import json
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from oesp_sdk.server import verify_tokens_batch
+
+    sender_ks = MemoryKeystore()
+    recipients = {f"oesp:did:r{i}": MemoryKeystore() for i in range(3)}
+
+    class CountingResolver(SimpleResolver):
+        calls = 0
+        def resolve_did(self, did):
+            self.calls += 1
+            return super().resolve_did(did)
+
+    resolver = CountingResolver()
+    for did, ks in recipients.items():
+        resolver.add(did, ks.get_x25519_public())
+    client = OESPClient(sender_ks, resolver=resolver)
+
+    messages = [(f"oesp:did:r{i % 3}", {"n": i}) for i in range(30)]
+    tokens = client.pack_many(messages)
+    assert resolver.calls == 3
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        tokens += client.pack_many(messages, executor=pool)
+    with ProcessPoolExecutor(max_workers=1) as procs:
+        with pytest.raises(TypeError):
+            client.pack_many(messages, executor=procs)
+
+    results = verify_tokens_batch(tokens)
+    assert all(r["ok"] for r in results)
+    assert len({r["result"]["envelope"]["mid"] for r in results}) == 60
+    for i, token in enumerate(tokens):
+        to_did, body = messages[i % 30]
+        decoded = OESPClient(recipients[to_did]).unpack(token)
+        assert json.loads(decoded["plaintext"]) == body
@@ -1,8 +1,9 @@
 import time
 import pytest
 from oesp_sdk.client import OESPClient, MemoryKeystore
-from oesp_sdk.server import verify_token, ServerPolicy, InMemoryReplayStore
+from oesp_sdk.server import verify_token, verify_tokens_batch, ServerPolicy, InMemoryReplayStore
 from oesp_sdk.core.errors import ExpiredError, InvalidSignatureError, ReplayError
+from oesp_sdk.core.types import ErrorCode
 
 class SimpleResolver:
     def __init__(self):
@@ -88,3 +89,294 @@ def test_bad_signature():
     
     with pytest.raises(InvalidSignatureError):
         verify_token(corrupted_token)
+
+def test_verify_tokens_batch():
+    ks = MemoryKeystore()
+    resolver = SimpleResolver()
+    client = OESPClient(ks, resolver=resolver)
+    did = client.get_did()
+    resolver.add(did, ks.get_x25519_public())
+
+    good1 = client.pack(did, {"data": 1})
+    good2 = client.pack(did, {"data": 2})
+    store = InMemoryReplayStore()
+
+    results = verify_tokens_batch([good1, "OESP1.INVALID", good2, good1], replay_store=store)
+
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert [r["ok"] for r in results] == [True, False, True, False]
+    assert results[0]["result"]["signer_did"] == did
+    assert results[1]["error_code"] == ErrorCode.INVALID_FORMAT
+    assert results[3]["error_code"] == ErrorCode.REPLAY
+
+def test_verify_tokens_batch_bad_signature():
+    ks = MemoryKeystore()
+    resolver = SimpleResolver()
+    client = OESPClient(ks, resolver=resolver)
+    did = client.get_did()
+    resolver.add(did, ks.get_x25519_public())
+
+    token = client.pack(did, {"data": 1})
+    prefix, payload_b64 = token.split(".")
+    from oesp_sdk.core.b64url import decode, encode
+    import json
+
+    payload = json.loads(decode(payload_b64).decode("utf-8"))
+    payload["mid"] = "corrupted"
+    corrupted_token = f"{prefix}.{encode(json.dumps(payload).encode('utf-8'))}"
+
+    results = verify_tokens_batch([corrupted_token, token])
+    assert results[0]["error_code"] == ErrorCode.INVALID_SIGNATURE
+    assert results[1]["ok"] is True
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_parse_token_validates_schema(monkeypatch, use_orjson):
+    from oesp_sdk.core import jsonutil
+    from oesp_sdk.core.b64url import decode, encode
+    from oesp_sdk.core.errors import InvalidFormatError
+    from oesp_sdk.server import parse_token
+    import json
+
+    if use_orjson and not jsonutil.HAS_ORJSON:
+        pytest.skip("orjson not installed")
+    if not use_orjson:
+        monkeypatch.setattr(jsonutil, "orjson", None)
+
+    ks = MemoryKeystore()
+    resolver = SimpleResolver()
+    client = OESPClient(ks, resolver=resolver)
+    did = client.get_did()
+    resolver.add(did, ks.get_x25519_public())
+    token = client.pack(did, {"data": 1})
+
+    env = parse_token(token)
+    assert env.sender.did == did
+    assert verify_token(token)["verified"] is True
+
+    payload = json.loads(decode(token[6:]))
+    for key, value in [("ts", "1"), ("mid", 5), ("v", 2), ("from", {"did": did}), ("tag", 1)]:
+        bad = dict(payload, **{key: value})
+        with pytest.raises(InvalidFormatError):
+            parse_token("OESP1." + encode(json.dumps(bad).encode()))
+    with pytest.raises(InvalidFormatError):
+        parse_token("OESP1." + encode(b"[1, 2]"))
+
+def test_sql_replay_store_check_and_mark(tmp_path):
+    import gc
+    import threading
+    from oesp_sdk.server import SqlReplayStore
+
+    store = SqlReplayStore(str(tmp_path / "replay.db"))
+    assert store.check_and_mark("m1", "did:a") is False
+    assert store.check_and_mark("m1", "did:a") is True
+    assert store.seen("m1", "did:a")
+    assert store.check_and_mark_many([("m2", "did:a"), ("m1", "did:a"), ("m2", "did:a"), ("m1", "did:b")]) == [
+        False, True, True, False
+    ]
+
+    # Each thread gets its own connection on the same WAL database
+    out = []
+    t = threading.Thread(target=lambda: out.append(store.check_and_mark("m2", "did:a")))
+    t.start()
+    t.join()
+    assert out == [True]
+
+    # Connections of finished threads are closed, not kept until close()
+    threads = [threading.Thread(target=store.seen, args=(f"m{i}", "did:a")) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    gc.collect()
+    assert len(store._conns) == 1
+    store.close()
+    assert not store._conns
+
+    reopened = SqlReplayStore(str(tmp_path / "replay.db"))
+    assert reopened.seen("m1", "did:b")
+    reopened.close()
+
+def test_verify_tokens_batch_sql_replay_store():
+    from oesp_sdk.server import SqlReplayStore
+
+    ks = MemoryKeystore()
+    resolver = SimpleResolver()
+    client = OESPClient(ks, resolver=resolver)
+    did = client.get_did()
+    resolver.add(did, ks.get_x25519_public())
+    good1 = client.pack(did, {"data": 1})
+    good2 = client.pack(did, {"data": 2})
+
+    store = SqlReplayStore(":memory:")
+    results = verify_tokens_batch([good1, good2, good1, "OESP1.INVALID"], replay_store=store)
+    assert [r["ok"] for r in results] == [True, True, False, False]
+    assert results[2]["error_code"] == ErrorCode.REPLAY
+    assert results[3]["error_code"] == ErrorCode.INVALID_FORMAT
+    with pytest.raises(ReplayError):
+        verify_token(good2, replay_store=store)
+
+def test_in_memory_replay_store_expiry_and_capacity():
+    clock = [1000.0]
+    store = InMemoryReplayStore(max_entries=3, clock=lambda: clock[0])
+
+    assert store.check_and_mark("m1", "did:a", 1010) is False
+    assert store.check_and_mark("m2", "did:a", 1020) is False
+    assert store.check_and_mark("m1", "did:a", 1010) is True
+    assert store.seen("m2", "did:a")
+
+    clock[0] = 1015.0
+    assert not store.seen("m1", "did:a")
+    assert store.check_and_mark("m3", "did:a", 1100) is False
+    assert store.check_and_mark("m4", "did:a") is False
+    assert store.check_and_mark("m5", "did:a") is False
+    # Full: the soonest-expiring entry (m2) made room for m5
+    assert not store.seen("m2", "did:a")
+    assert store.seen("m5", "did:a")
+
+    stats = store.stats()
+    assert stats["size"] == len(store) == 3
+    assert stats["evicted_expired"] == 1
+    assert stats["evicted_capacity"] == 1
+    assert stats["replays"] == 1
+
+    clock[0] = 2000.0
+    assert store.evict_expired() == 1
+    assert len(store) == 2
+
+def test_in_memory_replay_store_bounded_under_default_policy():
+    from oesp_sdk.server.replay import DEFAULT_MAX_ENTRIES
+    assert InMemoryReplayStore().stats()["max_entries"] == DEFAULT_MAX_ENTRIES
+
+    ks = MemoryKeystore()
+    resolver = SimpleResolver()
+    client = OESPClient(ks, resolver=resolver)
+    did = client.get_did()
+    resolver.add(did, ks.get_x25519_public())
+    # Default policy: entries carry no expiry, only the size bound evicts
+    store = InMemoryReplayStore(max_entries=3)
+    for i in range(5):
+        verify_token(client.pack(did, {"data": i}), replay_store=store)
+    assert len(store) == 3
+    assert store.stats()["evicted_capacity"] == 2
+
+def test_in_memory_replay_store_evicts_oldest_without_expiry():
+    store = InMemoryReplayStore(max_entries=100)
+    for i in range(1000):
+        assert store.check_and_mark(f"m{i}", "did:a") is False
+    assert len(store) == 100
+    assert all(store.seen(f"m{i}", "did:a") for i in range(900, 1000))
+    assert not store.seen("m899", "did:a")
+
+def test_replay_entries_expire_with_strict_policy():
+    ks = MemoryKeystore()
+    resolver = SimpleResolver()
+    client = OESPClient(ks, resolver=resolver)
+    did = client.get_did()
+    resolver.add(did, ks.get_x25519_public())
+    token = client.pack(did, {"data": 1}, ttl_sec=60)
+
+    strict = ServerPolicy(allow_expired=False, max_clock_skew_sec=30)
+    store = InMemoryReplayStore()
+    verify_token(token, policy=strict, replay_store=store)
+    env_exp = verify_token(token, policy=ServerPolicy())["envelope"]["exp"]
+    assert store._seen[next(iter(store._seen))] == env_exp + 30
+
+    lenient = InMemoryReplayStore()
+    verify_token(token, replay_store=lenient)
+    assert lenient._seen[next(iter(lenient._seen))] == float("inf")
+
+def test_bloom_replay_store(tmp_path):
+    from oesp_sdk.server import BloomFilter, BloomReplayStore, SqlReplayStore
+
+    bloom = BloomFilter(capacity=1000, fp_rate=0.01)
+    assert bloom.num_hashes == 7
+    capped = BloomFilter(capacity=1000, fp_rate=0.01, max_bytes=64)
+    assert capped.size_bytes == 64
+
+    backing = SqlReplayStore(str(tmp_path / "replay.db"))
+    backing.check_and_mark_many([(f"old{i}", "did:a") for i in range(50)])
+
+    store = BloomReplayStore(backing, capacity=1000, fp_rate=0.01)
+    assert store.rebuild() == 50
+    assert store.seen("old7", "did:a")
+    assert store.check_and_mark("old7", "did:a") is True
+
+    assert store.check_and_mark("new1", "did:a") is False
+    assert store.check_and_mark("new1", "did:a") is True
+    assert store.check_and_mark_many([("new2", "did:a"), ("new2", "did:a"), ("old1", "did:a")]) == [False, True, True]
+    assert backing.seen("new2", "did:a")
+
+    for i in range(200):
+        assert not store.seen(f"absent{i}", "did:a")
+    stats = store.stats()
+    assert stats["entries"] == 52
+    assert stats["filtered"] + stats["false_positives"] >= 200
+    assert stats["filtered"] >= 190
+    backing.close()
+
+def test_bloom_replay_store_skips_lookup_on_miss(tmp_path):
+    from oesp_sdk.server import BloomReplayStore, SqlReplayStore
+
+    class CountingStore(SqlReplayStore):
+        lookups = 0
+        def check_and_mark(self, *args):
+            CountingStore.lookups += 1
+            return super().check_and_mark(*args)
+        def seen(self, *args):
+            CountingStore.lookups += 1
+            return super().seen(*args)
+
+    backing = CountingStore(str(tmp_path / "replay.db"))
+    store = BloomReplayStore(backing, capacity=10_000, fp_rate=0.001)
+    for i in range(100):
+        assert store.check_and_mark(f"m{i}", "did:a", 1e12) is False
+    assert CountingStore.lookups == 0
+    assert backing.seen("m42", "did:a")
+    lookups = CountingStore.lookups
+    assert store.check_and_mark("m42", "did:a") is True
+    assert CountingStore.lookups == lookups + 1
+    backing.close()
+
+def test_bloom_replay_store_protocol_backing_and_inflight(tmp_path):
+    from oesp_sdk.server import BloomReplayStore, SqlReplayStore
+    from oesp_sdk.server.replay import _replay_key
+
+    class PlainStore:
+        # Bare ReplayStore protocol: mark_seen takes no expiry
+        def __init__(self):
+            self.keys = set()
+        def seen(self, mid, from_did):
+            return (mid, from_did) in self.keys
+        def mark_seen(self, mid, from_did):
+            self.keys.add((mid, from_did))
+
+    plain = BloomReplayStore(PlainStore(), capacity=100)
+    assert plain.check_and_mark("m1", "did:a", time.time() + 60) is False
+    plain.mark_seen("m2", "did:a", time.time() + 60)
+    assert plain.check_and_mark("m1", "did:a", time.time() + 60) is True
+    assert plain.check_and_mark_many([("m2", "did:a"), ("m3", "did:a")]) == [True, False]
+
+    backing = SqlReplayStore(str(tmp_path / "replay.db"))
+    store = BloomReplayStore(backing, capacity=100)
+    # A concurrent check_and_mark has claimed m1 but not written it yet
+    store._inflight.add(_replay_key("m1", "did:a"))
+    assert store.check_and_mark_many([("m1", "did:a"), ("m2", "did:a"), ("m2", "did:a")]) == [True, False, True]
+    assert not backing.seen("m1", "did:a")
+    assert backing.seen("m2", "did:a")
+    assert store._inflight == {_replay_key("m1", "did:a")}
+    backing.close()
+
+def test_bloom_replay_store_with_verifier():
+    from oesp_sdk.server import BloomReplayStore
+
+    ks = MemoryKeystore()
+    resolver = SimpleResolver()
+    client = OESPClient(ks, resolver=resolver)
+    did = client.get_did()
+    resolver.add(did, ks.get_x25519_public())
+    token = client.pack(did, {"data": 1})
+
+    store = BloomReplayStore(InMemoryReplayStore(), capacity=100)
+    verify_token(token, replay_store=store)
+    with pytest.raises(ReplayError):
+        verify_token(token, replay_store=store)
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import unittest
+import httpx
+from oesp_sdk.core.b64url import decode as b64url_decode, encode as b64url_encode
+from oesp_sdk.sync.client import OESPSyncClient, iter_jsonl_chunks
+
+async def _lines(tokens):
+    for i, t in enumerate(tokens):
+        line = json.dumps({"token": t}).encode("utf-8")
+        yield line if i == 0 else b"\n" + line
+
+async def _collect(agen):
+    return [c async for c in agen]
+
+class TestJsonlChunks(unittest.TestCase):
+    def test_chunks_match_joined_body(self):
+        tokens = [f"OESP1.{'x' * (i * 7)}" for i in range(50)]
+        expected = "\n".join(json.dumps({"token": t}) for t in tokens).encode("utf-8")
+        for size in (1, 13, 100, len(expected), len(expected) * 2):
+            chunks = asyncio.run(_collect(iter_jsonl_chunks(_lines(tokens), size)))
+            self.assertEqual(b"".join(chunks), expected)
+            self.assertTrue(all(len(c) == size for c in chunks[:-1]))
+            self.assertLessEqual(len(chunks[-1]), size)
+
+    def test_empty(self):
+        self.assertEqual(asyncio.run(_collect(iter_jsonl_chunks(_lines([]), 10))), [])
+
+class FakeSyncServer:
+    """Minimal in-process stand-in for the /v1/sync endpoints."""
+    def __init__(self, fail_once=(), drop_after_store=(), delay=0.01, max_chunk_bytes=500000):
+        self.chunks = {}
+        self.fail_once = set(fail_once)
+        self.drop_after_store = set(drop_after_store)
+        self.delay = delay
+        self.max_chunk_bytes = max_chunk_bytes
+        self.uploads = []
+        self.methods = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.committed_hash = None
+        self.restarts = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        assert request.headers["X-OESP-DEVICE"] == "oesp:did:dev"
+        path = request.url.path
+        if path == "/v1/sync/start":
+            if json.loads(request.content).get("restart"):
+                self.restarts += 1
+                self.chunks.clear()
+            return httpx.Response(200, json={
+                "session_id": "s1",
+                "max_chunk_bytes": self.max_chunk_bytes,
+                "resume": {"last_acked_seq": max(self.chunks, default=-1), "acked_chunks": len(self.chunks)}
+            })
+        if path == "/v1/sync/s1/status":
+            return httpx.Response(200, json={
+                "status": "open",
+                "last_acked_seq": max(self.chunks, default=-1),
+                "acked_chunks": len(self.chunks),
+                "acked_seqs": sorted(self.chunks),
+                "chunks": [
+                    {"seq": seq, "sha256": b64url_encode(hashlib.sha256(self.chunks[seq]).digest())}
+                    for seq in sorted(self.chunks)
+                ]
+            })
+        if path.startswith("/v1/sync/s1/chunk"):
+            if request.method == "PUT":
+                seq = int(path.rsplit("/", 1)[1])
+                payload = request.content
+                sha256 = b64url_decode(request.headers["X-OESP-CHUNK-SHA256"])
+            else:
+                req = json.loads(request.content)
+                seq = req["seq"]
+                payload = b64url_decode(req["payload_b64"])
+                sha256 = b64url_decode(req["sha256_b64"])
+            assert sha256 == hashlib.sha256(payload).digest()
+            self.methods.add(request.method)
+            self.uploads.append(seq)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.delay)
+            finally:
+                self.in_flight -= 1
+            if seq in self.fail_once:
+                self.fail_once.discard(seq)
+                return httpx.Response(503)
+            self.chunks[seq] = payload
+            if seq in self.drop_after_store:
+                self.drop_after_store.discard(seq)
+                raise httpx.ReadError("connection dropped")
+            return httpx.Response(200, json={"acked_seq": seq})
+        if path == "/v1/sync/s1/commit":
+            self.committed_hash = b64url_decode(json.loads(request.content)["final_hash_b64"])
+            return httpx.Response(200, json={"status": "committed", "inserted": len(self.chunks), "duplicates": 0, "invalid": 0})
+        return httpx.Response(404)
+
+def _body(tokens):
+    return "\n".join(json.dumps({"token": t}) for t in tokens).encode("utf-8")
+
+class TestSyncClientUpload(unittest.IsolatedAsyncioTestCase):
+    def _client(self, server, **kwargs):
+        return OESPSyncClient(
+            base_url="http://sync.test",
+            transport=httpx.MockTransport(server.handler),
+            **kwargs
+        )
+
+    async def test_windowed_upload_with_retry(self):
+        server = FakeSyncServer(fail_once={1, 4})
+        client = self._client(server, max_chunk_bytes=64, upload_window=3)
+        tokens = [f"OESP1.token{i}" for i in range(20)]
+        res = await client.sync_tokens(tokens, device_did="oesp:did:dev")
+
+        self.assertTrue(res["success"], res["error"])
+        self.assertEqual(res["uploaded_count"], 20)
+        body = _body(tokens)
+        self.assertEqual(b"".join(server.chunks[i] for i in sorted(server.chunks)), body)
+        self.assertEqual(server.committed_hash, hashlib.sha256(body).digest())
+        self.assertEqual(server.methods, {"PUT"})
+        self.assertGreater(server.max_in_flight, 1)
+        self.assertLessEqual(server.max_in_flight, 3)
+
+    async def test_json_chunk_upload(self):
+        server = FakeSyncServer()
+        client = self._client(server, max_chunk_bytes=64, binary_chunks=False)
+        tokens = [f"OESP1.token{i}" for i in range(5)]
+        res = await client.sync_tokens(tokens, device_did="oesp:did:dev")
+        self.assertTrue(res["success"], res["error"])
+        self.assertEqual(server.methods, {"POST"})
+        self.assertEqual(server.committed_hash, hashlib.sha256(_body(tokens)).digest())
+
+    async def test_upload_failure_aborts(self):
+        server = FakeSyncServer(fail_once={0})
+        client = self._client(server, max_chunk_bytes=64, max_retries=0)
+        res = await client.sync_tokens(["OESP1.a", "OESP1.b"], device_did="oesp:did:dev")
+        self.assertFalse(res["success"])
+        self.assertIsNone(server.committed_hash)
+
+    async def test_failure_leaves_no_pending_uploads(self):
+        server = FakeSyncServer(fail_once={0}, delay=0.05)
+        client = self._client(server, max_chunk_bytes=64, upload_window=4, max_retries=0)
+        tokens = [f"OESP1.token{i}" for i in range(20)]
+        res = await client.sync_tokens(tokens, device_did="oesp:did:dev")
+        self.assertFalse(res["success"])
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        self.assertEqual(pending, [])
+        self.assertEqual(server.in_flight, 0)
+
+    async def test_server_chunk_limit(self):
+        server = FakeSyncServer(max_chunk_bytes=32)
+        client = self._client(server, max_chunk_bytes=64)
+        tokens = [f"OESP1.token{i}" for i in range(10)]
+        res = await client.sync_tokens(tokens, device_did="oesp:did:dev")
+        self.assertTrue(res["success"], res["error"])
+        self.assertTrue(all(len(c) <= 32 for c in server.chunks.values()))
+
+    async def test_resume_skips_acked_chunks(self):
+        tokens = [f"OESP1.token{i}" for i in range(20)]
+        body = _body(tokens)
+        server = FakeSyncServer()
+        # A previous attempt stored seqs 0, 1 and 3 before the uplink dropped
+        for seq in (0, 1, 3):
+            server.chunks[seq] = body[seq * 64:(seq + 1) * 64]
+
+        client = self._client(server, max_chunk_bytes=64)
+        res = await client.sync_tokens(tokens, device_did="oesp:did:dev", client_meta={"batch": 1})
+
+        self.assertTrue(res["success"], res["error"])
+        self.assertEqual(res["skipped_chunks"], 3)
+        self.assertNotIn(0, server.uploads)
+        self.assertNotIn(3, server.uploads)
+        self.assertEqual(server.committed_hash, hashlib.sha256(body).digest())
+
+    async def test_resume_reuploads_changed_chunks(self):
+        tokens = [f"OESP1.token{i}" for i in range(20)]
+        body = _body(tokens)
+        server = FakeSyncServer()
+        # Same client_meta, but the backlog changed since seqs 0 and 1 were stored
+        old = _body([f"OESP1.other{i}" for i in range(20)])
+        server.chunks[0] = body[:64]
+        server.chunks[1] = old[64:128]
+
+        client = self._client(server, max_chunk_bytes=64)
+        res = await client.sync_tokens(tokens, device_did="oesp:did:dev", client_meta={"batch": 1})
+
+        self.assertTrue(res["success"], res["error"])
+        self.assertEqual(res["skipped_chunks"], 1)
+        self.assertIn(1, server.uploads)
+        self.assertEqual(b"".join(server.chunks[i] for i in sorted(server.chunks)), body)
+
+    async def test_resume_restarts_session_with_stale_tail(self):
+        tokens = [f"OESP1.token{i}" for i in range(5)]
+        body = _body(tokens)
+        server = FakeSyncServer()
+        # An older, longer backlog left chunks past the end of this one
+        for seq in range(10):
+            server.chunks[seq] = b"x" * 64
+
+        client = self._client(server, max_chunk_bytes=64)
+        res = await client.sync_tokens(tokens, device_did="oesp:did:dev", client_meta={"batch": 1})
+        self.assertTrue(res["success"], res["error"])
+        self.assertEqual(server.restarts, 1)
+        self.assertEqual(b"".join(server.chunks[i] for i in sorted(server.chunks)), body)
+        self.assertEqual(server.committed_hash, hashlib.sha256(body).digest())
+
+        # A one-shot iterator cannot be replayed: the session is restarted and the call fails
+        for seq in range(10):
+            server.chunks[seq] = b"x" * 64
+        res = await client.sync_tokens(iter(tokens), device_did="oesp:did:dev", client_meta={"batch": 1})
+        self.assertFalse(res["success"])
+        self.assertEqual(server.restarts, 2)
+        self.assertEqual(server.chunks, {})
+
+    async def test_dropped_connection_checks_status(self):
+        server = FakeSyncServer(drop_after_store={2})
+        client = self._client(server, max_chunk_bytes=64)
+        tokens = [f"OESP1.token{i}" for i in range(20)]
+        res = await client.sync_tokens(tokens, device_did="oesp:did:dev")
+
+        self.assertTrue(res["success"], res["error"])
+        self.assertEqual(server.uploads.count(2), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,8 @@
+import asyncio
+import base64
+import json
+import random
+import time
 import unittest
 from oesp_sdk.transport import OESPBleGattTransport, BleGattLink
 
@@ -9,10 +14,329 @@ class MockLink(BleGattLink):
     async def start_notify(self) -> None: pass
     async def get_mtu_hint(self) -> int: return 185
 
+class LossyLink(BleGattLink):
+    """One end of an in-memory link: writes reach the peer's notify callback
+    after `latency` seconds, unless dropped with probability `loss`."""
+
+    def __init__(self, latency: float, loss: float, seed: int, mtu: int = 185):
+        self.latency = latency
+        self.mtu = mtu
+        self.sent = []
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.peer = None
+        self.writes = 0
+        self._cb = None
+
+    @classmethod
+    def pair(cls, latency: float = 0.002, loss: float = 0.0, seed: int = 0):
+        a, b = cls(latency, loss, seed), cls(latency, loss, seed + 1)
+        a.peer, b.peer = b, a
+        return a, b
+
+    async def connect(self, device_id: str) -> None: pass
+    async def disconnect(self) -> None: pass
+    async def start_notify(self) -> None: pass
+    async def get_mtu_hint(self) -> int: return self.mtu
+
+    def on_tx_notify(self, cb) -> None:
+        self._cb = cb
+
+    async def write_rx(self, data: bytes) -> None:
+        self.writes += 1
+        self.sent.append(bytes(data))
+        # Write-with-response: the write itself costs one link latency
+        await asyncio.sleep(self.latency)
+        if self.rng.random() >= self.loss:
+            asyncio.get_running_loop().call_later(self.latency, self.peer._deliver, data)
+
+    def _deliver(self, data: bytes) -> None:
+        if self._cb is not None:
+            self._cb(data)
+
 class TestTransport(unittest.IsolatedAsyncioTestCase):
     async def test_transport_init(self):
         transport = OESPBleGattTransport()
         self.assertEqual(transport.max_chunk_bytes, 1024)
 
+    async def _transfer(self, token, link_a, link_b, **opts):
+        sender = OESPBleGattTransport(**opts)
+        receiver = OESPBleGattTransport(**opts)
+        received = []
+        await sender.receive_loop(link_a, lambda t: None)
+        await receiver.receive_loop(link_b, received.append)
+        t0 = time.perf_counter()
+        await sender.send_token(token, link_a)
+        return received, time.perf_counter() - t0
+
+    async def test_windowed_transfer_is_faster(self):
+        token = "OESP1." + "x" * 3000
+        a, b = LossyLink.pair(latency=0.002)
+        received, stop_and_wait = await self._transfer(token, a, b, max_chunk_bytes=100, timeout_ms=500)
+        self.assertEqual(received, [token])
+
+        a, b = LossyLink.pair(latency=0.002)
+        received, windowed = await self._transfer(token, a, b, max_chunk_bytes=100, timeout_ms=500, window=8)
+        self.assertEqual(received, [token])
+        self.assertLess(windowed, stop_and_wait * 0.75)
+
+    async def test_windowed_transfer_recovers_from_loss(self):
+        token = "OESP1." + "".join(chr(65 + i % 26) for i in range(8000))
+        for seed in range(3):
+            a, b = LossyLink.pair(latency=0.001, loss=0.1, seed=seed * 10)
+            received, _ = await self._transfer(
+                token, a, b, max_chunk_bytes=100, timeout_ms=100, retries=10, window=8
+            )
+            self.assertEqual(received, [token])
+
+    async def test_peer_without_hello_falls_back_to_stop_and_wait(self):
+        a, b = LossyLink.pair()
+        sender = OESPBleGattTransport(window=8, timeout_ms=50)
+        await sender.receive_loop(a, lambda t: None)
+        # Bare peer that only acknowledges START/CHUNK/END like the original receiver
+        import json
+        def legacy(data):
+            frame = json.loads(data)
+            if frame["t"] == "HELLO":
+                return
+            ack = frame.get("seq", -1)
+            asyncio.get_running_loop().create_task(
+                b.write_rx(json.dumps({"t": "ACK", "sid": frame["sid"], "ack": ack}).encode())
+            )
+        b.on_tx_notify(legacy)
+        await sender.send_token("OESP1." + "y" * 2500, a)
+        self.assertEqual(await sender.negotiate(a), {})
+
+    async def test_binary_frames_fill_att_packets(self):
+        from oesp_sdk.transport.frames import decode_frame
+        token = "OESP1." + "z" * 5000
+        a, b = LossyLink.pair()
+        received, _ = await self._transfer(token, a, b, timeout_ms=500, window=4, binary=True)
+        self.assertEqual(received, [token])
+
+        frames = [decode_frame(d) for d in a.sent]
+        chunk_sizes = [len(d) for d, f in zip(a.sent, frames) if f["t"] == "CHUNK"]
+        self.assertTrue(all(size == 185 - 3 for size in chunk_sizes[:-1]))
+        self.assertEqual(sum(len(f["data"]) for f in frames if f["t"] == "CHUNK"), len(token))
+        # HELLO stays JSON; everything else is binary
+        self.assertEqual(a.sent[0][:1], b"{")
+        self.assertTrue(all(d[0] & 0x80 for d in a.sent[1:]))
+        self.assertTrue(all(d[0] & 0x80 for d in b.sent[1:]))
+
+    def test_frame_codec_roundtrip(self):
+        from oesp_sdk.transport.frames import encode_frame, decode_frame, wire_sid
+        sid = wire_sid("my-session")
+        self.assertEqual(len(bytes.fromhex(sid)), 4)
+        frames = [
+            {"t": "START", "sid": sid, "mid": "abcd1234", "totalLen": 10, "parts": 2,
+             "sha256": "n4bQgYhMfWWaL+qgxVrQFaO/TxsrC4Is0V1sFbDwCgg="},
+            {"t": "START", "sid": sid, "mid": "abcd1234", "totalLen": 10, "parts": 1,
+             "sha256": "n4bQgYhMfWWaL+qgxVrQFaO/TxsrC4Is0V1sFbDwCgg=", "chunk": 10, "items": 2},
+            {"t": "CHUNK", "sid": sid, "seq": 1, "data": b"\x00\xffdata"},
+            {"t": "END", "sid": sid},
+            {"t": "ACK", "sid": sid, "ack": -1},
+            {"t": "NACK", "sid": sid, "at": 3, "reason": "BAD_SEQ"},
+        ]
+        for frame in frames:
+            self.assertEqual(decode_frame(encode_frame(frame, binary=True)), frame)
+            self.assertEqual(decode_frame(encode_frame(frame)), frame)
+
+    async def test_concurrent_transfers_on_one_link(self):
+        tokens = ["OESP1." + c * (1500 + 300 * i) for i, c in enumerate("abcd")]
+        a, b = LossyLink.pair(latency=0.001, loss=0.05, seed=7)
+        sender = OESPBleGattTransport(max_chunk_bytes=128, timeout_ms=100, retries=10, window=4, binary=True)
+        receiver = OESPBleGattTransport()
+        received = []
+        await sender.receive_loop(a, lambda t: None)
+        await receiver.receive_loop(b, received.append)
+        await sender.negotiate(a)
+        await asyncio.gather(*(sender.send_token(t, a) for t in tokens))
+        self.assertEqual(sorted(received), sorted(tokens))
+
+    async def test_send_tokens_batches_into_one_transfer(self):
+        tokens = ["OESP1." + c * (40 + 90 * i) for i, c in enumerate("abcdefghij")]
+        for binary in (False, True):
+            a, b = LossyLink.pair(latency=0.001, loss=0.05, seed=11)
+            sender = OESPBleGattTransport(max_chunk_bytes=128, timeout_ms=100, retries=10, window=4, binary=binary)
+            receiver = OESPBleGattTransport()
+            received = []
+            await sender.receive_loop(a, lambda t: None)
+            await receiver.receive_loop(b, received.append)
+            await sender.send_tokens(tokens, a)
+            self.assertEqual(received, tokens)
+            # One START for the whole batch (possibly retransmitted)
+            starts = {d for d in a.sent if d[:1] == b"\x86" or b'"START"' in d}
+            self.assertEqual(len(starts), 1)
+
+    async def test_send_tokens_to_legacy_peer(self):
+        a, b = LossyLink.pair(latency=0.001)
+        sender = OESPBleGattTransport(timeout_ms=50)
+        received = []
+
+        def legacy_receiver(data):
+            # Peer without HELLO/batch support: plain stop-and-wait receiver
+            frame = json.loads(data)
+            if frame["t"] == "HELLO":
+                return
+            ack = {"t": "ACK", "sid": frame["sid"], "ack": frame.get("seq", -1)}
+            if frame["t"] == "CHUNK":
+                received.append(base64.b64decode(frame["data"]).decode())
+            asyncio.create_task(b.write_rx(json.dumps(ack).encode()))
+
+        await sender.receive_loop(a, lambda t: None)
+        b.on_tx_notify(legacy_receiver)
+        await sender.send_tokens(["OESP1.one", "OESP1.two"], a)
+        self.assertEqual(received, ["OESP1.one", "OESP1.two"])
+
+    async def test_simulated_link_with_reordering_and_stats(self):
+        from oesp_sdk.transport import SimulatedGattLink
+        token = "OESP1." + "s" * 3000
+        a, b = SimulatedGattLink.pair(
+            conn_interval_ms=1, write_latency_ms=1, jitter_ms=0.5, drop_prob=0.05, reorder_prob=0.1, seed=3
+        )
+        sender = OESPBleGattTransport(timeout_ms=100, retries=10, window=8, binary=True)
+        receiver = OESPBleGattTransport()
+        received = []
+        await sender.receive_loop(a, lambda t: None)
+        await receiver.receive_loop(b, received.append)
+        await sender.send_token(token, a)
+        self.assertEqual(received, [token])
+
+        stats = sender.stats()
+        self.assertEqual(stats["tokens_sent"], 1)
+        self.assertEqual(receiver.stats()["tokens_received"], 1)
+        self.assertEqual(stats["frames_sent"], a.stats()["writes"])
+        self.assertEqual(stats["bytes_sent"], a.stats()["bytes"])
+        # Binary frames fit in one ATT packet each
+        self.assertEqual(a.stats()["packets"], a.stats()["writes"])
+        if a.stats()["dropped"]:
+            self.assertGreater(stats["retries"], 0)
+        sender.reset_stats()
+        self.assertEqual(sender.stats()["frames_sent"], 0)
+
+    async def test_stop_and_wait_round_trips(self):
+        from oesp_sdk.transport import SimulatedGattLink
+        a, b = SimulatedGattLink.pair(conn_interval_ms=0, write_latency_ms=0.5)
+        sender = OESPBleGattTransport(max_chunk_bytes=100)
+        receiver = OESPBleGattTransport()
+        await sender.receive_loop(a, lambda t: None)
+        await receiver.receive_loop(b, lambda t: None)
+        await sender.send_token("OESP1." + "r" * 994, a)
+        # START + 10 CHUNKs + END, one exchange each; JSON frames span several ATT packets
+        self.assertEqual(sender.stats()["round_trips"], 12)
+        self.assertEqual(sender.stats()["retries"], 0)
+        self.assertGreater(a.stats()["packets"], a.stats()["writes"])
+
+    async def test_evicted_transfer_fails_fast(self):
+        for window in (1, 8):
+            a, b = LossyLink.pair(latency=0.001)
+            sender = OESPBleGattTransport(max_chunk_bytes=64, timeout_ms=2000, retries=3, window=window)
+            receiver = OESPBleGattTransport(max_sessions=1)
+            received = []
+            await sender.receive_loop(a, lambda t: None)
+            await receiver.receive_loop(b, received.append)
+            await sender.negotiate(a)
+            t0 = time.monotonic()
+            # The second START evicts the first transfer's session
+            results = await asyncio.gather(
+                sender.send_token("OESP1." + "a" * 2000, a),
+                sender.send_token("OESP1." + "b" * 2000, a),
+                return_exceptions=True,
+            )
+            errors = [r for r in results if isinstance(r, Exception)]
+            self.assertEqual(len(errors), 1)
+            self.assertIn("TIMEOUT", str(errors[0]))
+            self.assertEqual(len(received), 1)
+            self.assertLess(time.monotonic() - t0, 1.0)
+
+class TestReassembly(unittest.TestCase):
+    def _sha(self, data):
+        import base64, hashlib
+        return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+    def test_out_of_order_in_place(self):
+        from oesp_sdk.transport.reassembly import ReassemblyBuffer
+        data = bytes(range(256)) * 4
+        chunks = [data[i:i + 100] for i in range(0, len(data), 100)]
+        buf = ReassemblyBuffer("s1", len(data), len(chunks), self._sha(data), chunk_size=100)
+        for seq in [3, 0, 10, 1, 2, 1] + list(range(4, 10)):
+            buf.add(seq, chunks[seq])
+        self.assertTrue(buf.complete)
+        self.assertTrue(buf.verify())
+        self.assertEqual(buf.data(), data)
+        with self.assertRaises(ValueError):
+            buf.add(11, b"x")
+
+    def test_chunk_size_inferred_without_start_field(self):
+        from oesp_sdk.transport.reassembly import ReassemblyBuffer
+        data = b"0123456789" * 25
+        chunks = [data[i:i + 64] for i in range(0, len(data), 64)]
+        buf = ReassemblyBuffer("s1", len(data), len(chunks), self._sha(data))
+        buf.add(3, chunks[3])
+        with self.assertRaises(ValueError):
+            ReassemblyBuffer("s2", len(data), len(chunks), self._sha(data), chunk_size=10)
+        for seq in range(3):
+            buf.add(seq, chunks[seq])
+        self.assertTrue(buf.verify())
+        self.assertEqual(buf.data(), data)
+
+        bad = ReassemblyBuffer("s3", 5, 1, self._sha(b"other"))
+        bad.add(0, b"hello")
+        self.assertFalse(bad.verify())
+
+    def test_bad_first_chunk_does_not_fix_chunk_size(self):
+        from oesp_sdk.transport.reassembly import ReassemblyBuffer
+        data = b"0123456789" * 25
+        chunks = [data[i:i + 64] for i in range(0, len(data), 64)]
+        buf = ReassemblyBuffer("s1", len(data), len(chunks), self._sha(data))
+        with self.assertRaises(ValueError):
+            buf.add(0, data[:10])
+        self.assertIsNone(buf.chunk_size)
+        for seq, chunk in enumerate(chunks):
+            buf.add(seq, chunk)
+        self.assertTrue(buf.verify())
+        self.assertEqual(buf.data(), data)
+
+    def test_session_table_eviction_and_expiry(self):
+        from oesp_sdk.transport.reassembly import ReassemblyBuffer, SessionTable
+        now = [0.0]
+        table = SessionTable(max_sessions=2, timeout_sec=10, clock=lambda: now[0])
+        mk = lambda sid: ReassemblyBuffer(sid, 1, 1, "")
+        self.assertEqual(table.open(mk("a")), [])
+        now[0] = 1
+        table.open(mk("b"))
+        now[0] = 2
+        table.get("a")
+        evicted = table.open(mk("c"))
+        self.assertEqual([s.sid for s in evicted], ["b"])
+        now[0] = 11.5
+        self.assertEqual(table.expire(), [])
+        now[0] = 12.5
+        self.assertEqual([s.sid for s in table.expire()], ["a", "c"])
+        self.assertEqual(len(table), 0)
+
+    def test_batch_records_released_from_contiguous_prefix(self):
+        from oesp_sdk.transport.reassembly import ReassemblyBuffer
+        records = [b"first", b"second" * 10, b"", b"last"]
+        data = b"".join(len(r).to_bytes(4, "big") + r for r in records)
+        chunks = [data[i:i + 16] for i in range(0, len(data), 16)]
+        buf = ReassemblyBuffer("s1", len(data), len(chunks), self._sha(data), chunk_size=16, items=len(records))
+        buf.add(1, chunks[1])
+        self.assertEqual(buf.take_records(), [])
+        buf.add(0, chunks[0])
+        self.assertEqual(buf.take_records(), [b"first"])
+        got = []
+        for seq in range(2, len(chunks)):
+            buf.add(seq, chunks[seq])
+            got += buf.take_records()
+        self.assertEqual(got, records[1:])
+        self.assertTrue(buf.verify())
+
+        short = ReassemblyBuffer("s2", len(data), len(chunks), self._sha(data), chunk_size=16, items=5)
+        for seq, chunk in enumerate(chunks):
+            short.add(seq, chunk)
+        with self.assertRaises(ValueError):
+            short.take_records()
+
 if __name__ == '__main__':
     unittest.main()
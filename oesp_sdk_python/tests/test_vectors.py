@@ -24,3 +24,46 @@ def test_rng_determinism():
     rng2 = DeterministicRNG(b"seed")
     val2 = rng2.read(10)
     assert val1 == val2
+
+def test_prepared_keys_match_one_shot_helpers():
+    from oesp_sdk.crypto.ed25519 import (
+        generate_ed25519_keypair, sign_ed25519, verify_ed25519, Ed25519Signer, get_verify_key
+    )
+    from oesp_sdk.crypto.x25519 import (
+        generate_x25519_keypair, seal_session_key_x25519, X25519SealedBoxOpener
+    )
+
+    priv, pub = generate_ed25519_keypair()
+    data = b"payload"
+    sig = Ed25519Signer(priv).sign(data)
+    assert sig == sign_ed25519(priv, data)
+    assert verify_ed25519(pub, data, sig)
+    assert not verify_ed25519(pub, b"other", sig)
+    assert get_verify_key(pub) is get_verify_key(pub)
+
+    x_priv, x_pub = generate_x25519_keypair()
+    ek = seal_session_key_x25519(x_pub, SEED_A)
+    assert X25519SealedBoxOpener(x_priv).open(ek) == SEED_A
+
+def test_did_cache():
+    from oesp_sdk.core.did import did_cache_info, did_cache_clear
+    did_cache_clear()
+    pub = b"\x02" * 32
+    first = derive_did(pub)
+    assert derive_did(bytearray(pub)) == first
+    info = did_cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+def test_envelope_encoder_matches_canonical_json():
+    from oesp_sdk.core.canonical import CanonicalEnvelopeEncoder
+    env = {
+        "v": 1, "typ": "oesp.message.é", "mid": "m1", "sid": "s1", "ts": 1, "exp": 2,
+        "from": {"pub": "cA", "did": "oesp:did:a"}, "to": {"did": "oesp:did:b"},
+        "enc": "CHACHA20-POLY1305", "kex": "X25519", "ek": "ZWs", "iv": "aXY",
+        "ct": "Y3Q", "sig_alg": "Ed25519", "sig": "c2ln", "tag": "t",
+    }
+    canon = CanonicalEnvelopeEncoder(env)
+    assert canon.token_bytes() == canonical_json_bytes(env)
+    assert canon.signing_bytes() == canonical_json_bytes(env, ["sig"])
+    assert canon.aad_bytes() == canonical_json_bytes(env, ["ct", "sig", "iv"])
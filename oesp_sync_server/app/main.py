@@ -1,9 +1,37 @@
+import asyncio
+import contextlib
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from .db import async_session
 from .routes import sync
 from .middlewares.auth import AuthMiddleware
+from .services.sync_service import SyncService
+from .services.verify_executor import shutdown_verify_executor
 from .settings import settings
 
-app = FastAPI(title=settings.PROJECT_NAME)
+logger = logging.getLogger(__name__)
+
+async def _gc_loop():
+    while True:
+        try:
+            async with async_session() as db:
+                await SyncService(db).collect_garbage()
+        except Exception:
+            logger.exception("Chunk garbage collection failed")
+        await asyncio.sleep(settings.GC_INTERVAL_SEC)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    gc_task = asyncio.create_task(_gc_loop()) if settings.GC_INTERVAL_SEC > 0 else None
+    yield
+    if gc_task is not None:
+        gc_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await gc_task
+    shutdown_verify_executor()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 # Add Auth Middleware
 app.add_middleware(AuthMiddleware)
@@ -32,7 +32,7 @@ class SyncChunk(SQLModel, table=True):
     seq: int = Field(primary_key=True)
     size: int
     sha256: bytes
-    payload: bytes
+    payload: Optional[bytes] = Field(default=None)  # only with CHUNK_STORE=database
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     session: SyncSession = Relationship(back_populates="chunks")
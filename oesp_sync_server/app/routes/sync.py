@@ -1,3 +1,4 @@
+import hashlib
 from fastapi import APIRouter, Depends, Request, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
@@ -6,7 +7,7 @@ from ..db import get_session
 from ..services.sync_service import SyncService
 from ..schemas.schemas import SyncStartRequest, SyncStartResponse, ChunkUploadRequest, CommitRequest
 from ..settings import settings
-from oesp_sdk.core.b64url import decode as b64_decode
+from oesp_sdk.core.b64url import decode as b64_decode, encode as b64_encode
 
 router = APIRouter(prefix="/v1/sync", tags=["sync"])
 
@@ -26,7 +27,8 @@ async def start_sync(
         expected_total_bytes=req.expected_total_bytes,
         expected_total_items=req.expected_total_items,
         device_pub_b64=req.device_pub_b64,
-        client_meta=req.client_meta
+        client_meta=req.client_meta,
+        restart=req.restart
     )
     
     return {
@@ -62,6 +64,44 @@ async def upload_chunk(
         "status": "ok"
     }
 
+@router.put("/{session_id}/chunk/{seq}")
+async def upload_chunk_raw(
+    session_id: UUID,
+    seq: int,
+    request: Request,
+    db: AsyncSession = Depends(get_session)
+):
+    """Raw chunk upload: application/octet-stream body, SHA-256 in X-OESP-CHUNK-SHA256 (base64url)."""
+    sha256_header = request.headers.get("X-OESP-CHUNK-SHA256")
+    if not sha256_header:
+        raise HTTPException(status_code=400, detail={"error": {"code": "BAD_REQUEST", "message": "X-OESP-CHUNK-SHA256 header missing"}})
+
+    # Hash and buffer the body as it arrives, without a base64/JSON round trip;
+    # the buffer is handed to the chunk store as is, without a bytes() copy
+    hasher = hashlib.sha256()
+    payload = bytearray()
+    async for part in request.stream():
+        if len(payload) + len(part) > settings.MAX_CHUNK_BYTES:
+            raise HTTPException(status_code=400, detail={"error": {"code": "TOO_LARGE", "message": f"Chunk too large, max {settings.MAX_CHUNK_BYTES}"}})
+        hasher.update(part)
+        payload += part
+
+    service = SyncService(db)
+    session = await service.add_chunk(
+        session_id=session_id,
+        seq=seq,
+        payload=payload,
+        sha256_bytes=b64_decode(sha256_header),
+        actual_hash=hasher.digest()
+    )
+
+    return {
+        "acked_seq": seq,
+        "last_acked_seq": session.last_acked_seq,
+        "acked_chunks": session.acked_chunks,
+        "status": "ok"
+    }
+
 @router.get("/{session_id}/status")
 async def get_status(
     session_id: UUID,
@@ -69,11 +109,15 @@ async def get_status(
 ):
     service = SyncService(db)
     session = await service.get_session(session_id)
+    chunks = await service.get_chunk_hashes(session_id)
     
     return {
         "status": session.status,
         "last_acked_seq": session.last_acked_seq,
-        "acked_chunks": session.acked_chunks
+        "acked_chunks": session.acked_chunks,
+        "acked_seqs": [seq for seq, _ in chunks],
+        # Lets a resuming client re-upload chunks that differ from its own
+        "chunks": [{"seq": seq, "sha256": b64_encode(sha256)} for seq, sha256 in chunks]
     }
 
 @router.post("/{session_id}/commit")
@@ -8,6 +8,8 @@ class SyncStartRequest(BaseModel):
     expected_total_bytes: int
     expected_total_items: int
     client_meta: Optional[Dict[str, Any]] = None
+    # Abort the open session matching client_meta instead of resuming it
+    restart: bool = False
 
 class SyncStartResponse(BaseModel):
     session_id: UUID
@@ -0,0 +1,132 @@
+import asyncio
+import mmap
+import os
+import shutil
+import tempfile
+from uuid import UUID
+from typing import AsyncIterator, List, Optional, Protocol, Union
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import SyncChunk
+from ..settings import settings
+
+Buffer = Union[bytes, mmap.mmap]
+# Uploads are buffered in a bytearray and stored without copying to bytes
+WriteBuffer = Union[bytes, bytearray]
+
+class ChunkStore(Protocol):
+    """Storage for uploaded chunk payloads; SyncChunk rows always hold the metadata."""
+
+    async def write(self, session_id: UUID, seq: int, payload: WriteBuffer) -> Optional[WriteBuffer]:
+        """Persist a chunk payload. Returns the bytes to keep in SyncChunk.payload, if any."""
+        ...
+
+    def read_stream(self, session_id: UUID) -> AsyncIterator[Buffer]:
+        """Yield the session's payloads in seq order. Each buffer is only valid until the next one."""
+        ...
+
+    async def delete_session(self, session_id: UUID) -> None:
+        ...
+
+    async def stored_sessions(self) -> List[UUID]:
+        """Sessions that still have payloads in the store."""
+        ...
+
+class DatabaseChunkStore:
+    """Keeps payloads inline in SyncChunk.payload."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def write(self, session_id: UUID, seq: int, payload: WriteBuffer) -> Optional[WriteBuffer]:
+        return payload
+
+    async def read_stream(self, session_id: UUID) -> AsyncIterator[Buffer]:
+        stmt = select(SyncChunk.payload).where(SyncChunk.session_id == session_id).order_by(SyncChunk.seq)
+        res = await self.db.stream(stmt)
+        async for row in res:
+            yield row[0]
+
+    async def delete_session(self, session_id: UUID) -> None:
+        # Payloads go away with the metadata rows
+        pass
+
+    async def stored_sessions(self) -> List[UUID]:
+        res = await self.db.execute(select(SyncChunk.session_id).distinct())
+        return list(res.scalars().all())
+
+class FilesystemChunkStore:
+    """Writes one file per chunk under `<root>/<session_id>/` and reads them back through mmap."""
+
+    def __init__(self, db: AsyncSession, root: str):
+        self.db = db
+        self.root = root
+
+    def _session_dir(self, session_id: UUID) -> str:
+        return os.path.join(self.root, str(session_id))
+
+    def _chunk_path(self, session_id: UUID, seq: int) -> str:
+        return os.path.join(self._session_dir(session_id), f"{seq:08d}.chunk")
+
+    def _write_file(self, session_id: UUID, seq: int, payload: WriteBuffer) -> None:
+        path = self._chunk_path(session_id, seq)
+        session_dir = os.path.dirname(path)
+        os.makedirs(session_dir, exist_ok=True)
+        # Unique per write: concurrent uploads of the same seq must not share a temp file
+        fd, tmp = tempfile.mkstemp(prefix=f"{seq:08d}.", suffix=".tmp", dir=session_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _map_file(self, session_id: UUID, seq: int) -> mmap.mmap:
+        with open(self._chunk_path(session_id, seq), "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    async def write(self, session_id: UUID, seq: int, payload: WriteBuffer) -> Optional[WriteBuffer]:
+        await asyncio.to_thread(self._write_file, session_id, seq, payload)
+        return None
+
+    async def read_stream(self, session_id: UUID) -> AsyncIterator[Buffer]:
+        stmt = select(SyncChunk.seq, SyncChunk.size).where(SyncChunk.session_id == session_id).order_by(SyncChunk.seq)
+        res = await self.db.execute(stmt)
+        for seq, size in res.all():
+            if size == 0:
+                yield b""
+                continue
+            mm = await asyncio.to_thread(self._map_file, session_id, seq)
+            try:
+                yield mm
+            finally:
+                mm.close()
+
+    async def delete_session(self, session_id: UUID) -> None:
+        await asyncio.to_thread(shutil.rmtree, self._session_dir(session_id), True)
+
+    async def stored_sessions(self) -> List[UUID]:
+        def scan() -> List[UUID]:
+            if not os.path.isdir(self.root):
+                return []
+            sessions = []
+            for name in os.listdir(self.root):
+                try:
+                    sessions.append(UUID(name))
+                except ValueError:
+                    continue
+            return sessions
+        return await asyncio.to_thread(scan)
+
+def get_chunk_store(db: AsyncSession) -> ChunkStore:
+    """Build the chunk store selected by CHUNK_STORE for a DB session."""
+    if settings.CHUNK_STORE == "filesystem":
+        return FilesystemChunkStore(db, settings.CHUNK_STORE_DIR)
+    if settings.CHUNK_STORE == "database":
+        return DatabaseChunkStore(db)
+    raise ValueError(f"Unknown CHUNK_STORE: {settings.CHUNK_STORE}")
@@ -1,24 +1,27 @@
+import asyncio
 import hashlib
 import json
 import time
-from uuid import UUID
-from datetime import datetime
-from typing import List, Optional, Dict, Any, AsyncIterator
+from collections import deque
+from uuid import UUID, uuid4
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, AsyncIterator, Deque, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, and_
+from sqlalchemy import select, update, delete, and_, case, tuple_
 from sqlmodel import select as sql_select
 from fastapi import HTTPException
 
 from ..models.models import Device, SyncSession, SyncChunk, OESPMessage, SessionItem
 from .hash_stream import HashStream
-from ..utils.jsonl_stream import parse_jsonl_stream
+from .chunk_store import Buffer, ChunkStore, WriteBuffer, get_chunk_store
+from .verify_executor import verify_batch, verify_pipeline_depth
+from ..utils.jsonl_stream import parse_jsonl_batches
 from ..settings import settings
 
 # Import OESP SDK
 try:
-    from oesp_sdk.server.verifier import verify_token
     from oesp_sdk.server.policies import ServerPolicy
-    from oesp_sdk.core.errors import OESPError
+    from oesp_sdk.core.types import BatchVerifyResult
     from oesp_sdk.core.b64url import decode as b64_decode
 except ImportError:
     # This might happen during development if not installed
@@ -26,8 +29,9 @@ except ImportError:
     pass
 
 class SyncService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, chunk_store: Optional[ChunkStore] = None):
         self.db = db
+        self.chunk_store = chunk_store or get_chunk_store(db)
 
     async def start_session(
         self, 
@@ -35,7 +39,8 @@ class SyncService:
         expected_total_bytes: int, 
         expected_total_items: int,
         device_pub_b64: Optional[str] = None,
-        client_meta: Optional[Dict[str, Any]] = None
+        client_meta: Optional[Dict[str, Any]] = None,
+        restart: bool = False
     ) -> SyncSession:
         # 1. Handle Device
         result = await self.db.execute(sql_select(Device).where(Device.did == device_did))
@@ -54,6 +59,7 @@ class SyncService:
             self.db.add(device)
 
         # 2. Idempotent session start
+        aborted: List[UUID] = []
         if client_meta:
             # Check for existing open session with same meta for this device
             stmt = sql_select(SyncSession).where(
@@ -66,7 +72,13 @@ class SyncService:
             sessions = result.scalars().all()
             for s in sessions:
                 if s.client_meta == client_meta:
-                    return s
+                    if not restart:
+                        return s
+                    # The client's backlog no longer matches this session: drop it
+                    s.status = "aborted"
+                    self.db.add(s)
+                    await self.db.execute(delete(SyncChunk).where(SyncChunk.session_id == s.session_id))
+                    aborted.append(s.session_id)
 
         # 3. Create new session
         session = SyncSession(
@@ -78,6 +90,8 @@ class SyncService:
         self.db.add(session)
         await self.db.commit()
         await self.db.refresh(session)
+        for session_id in aborted:
+            await self.chunk_store.delete_session(session_id)
         return session
 
     async def get_session(self, session_id: UUID) -> SyncSession:
@@ -87,7 +101,25 @@ class SyncService:
             raise HTTPException(status_code=404, detail={"error": {"code": "SESSION_NOT_FOUND", "message": "Session not found"}})
         return session
 
-    async def add_chunk(self, session_id: UUID, seq: int, payload: bytes, sha256_bytes: bytes) -> SyncSession:
+    async def get_acked_seqs(self, session_id: UUID) -> List[int]:
+        """Seqs stored for a session, without loading chunk payloads."""
+        return [seq for seq, _ in await self.get_chunk_hashes(session_id)]
+
+    async def get_chunk_hashes(self, session_id: UUID) -> List[Tuple[int, bytes]]:
+        """(seq, sha256) of the chunks stored for a session, in seq order."""
+        res = await self.db.execute(
+            select(SyncChunk.seq, SyncChunk.sha256).where(SyncChunk.session_id == session_id).order_by(SyncChunk.seq)
+        )
+        return [(seq, sha256) for seq, sha256 in res.all()]
+
+    async def add_chunk(
+        self,
+        session_id: UUID,
+        seq: int,
+        payload: WriteBuffer,
+        sha256_bytes: bytes,
+        actual_hash: Optional[bytes] = None
+    ) -> SyncSession:
         # Validate session
         session = await self.get_session(session_id)
         if session.status != "open":
@@ -97,27 +129,49 @@ class SyncService:
         if len(payload) > settings.MAX_CHUNK_BYTES:
             raise HTTPException(status_code=400, detail={"error": {"code": "TOO_LARGE", "message": f"Chunk too large, max {settings.MAX_CHUNK_BYTES}"}})
 
-        # Validate hash
-        actual_hash = hashlib.sha256(payload).digest()
+        # Validate hash (callers that streamed the body pass the digest they computed)
+        if actual_hash is None:
+            actual_hash = hashlib.sha256(payload).digest()
         if actual_hash != sha256_bytes:
             raise HTTPException(status_code=400, detail={"error": {"code": "INVALID_HASH", "message": "SHA256 mismatch"}})
 
-        # Upsert chunk
-        chunk = SyncChunk(
-            session_id=session_id,
-            seq=seq,
-            size=len(payload),
-            sha256=sha256_bytes,
-            payload=payload
+        # Store the payload, then insert metadata; only the first upload of a seq counts as a new ack
+        inline_payload = await self.chunk_store.write(session_id, seq, payload)
+        res = await self.db.execute(
+            self._insert(SyncChunk)
+            .values(
+                session_id=session_id,
+                seq=seq,
+                size=len(payload),
+                sha256=sha256_bytes,
+                payload=inline_payload,
+                created_at=datetime.utcnow()
+            )
+            .on_conflict_do_nothing(index_elements=["session_id", "seq"])
+            .returning(SyncChunk.seq)
         )
-        await self.db.merge(chunk)
-        
-        # Update session ack stats
-        session.last_acked_seq = max(session.last_acked_seq, seq)
-        res = await self.db.execute(select(SyncChunk).where(SyncChunk.session_id == session_id))
-        session.acked_chunks = len(res.scalars().all())
-        
-        self.db.add(session)
+
+        if res.scalar_one_or_none() is not None:
+            # Update session ack stats atomically, without rereading chunks
+            await self.db.execute(
+                update(SyncSession)
+                .where(SyncSession.session_id == session_id)
+                .values(
+                    acked_chunks=SyncSession.acked_chunks + 1,
+                    last_acked_seq=case(
+                        (SyncSession.last_acked_seq < seq, seq),
+                        else_=SyncSession.last_acked_seq
+                    )
+                )
+            )
+        else:
+            # Re-upload of a known seq replaces the stored chunk
+            await self.db.execute(
+                update(SyncChunk)
+                .where(and_(SyncChunk.session_id == session_id, SyncChunk.seq == seq))
+                .values(size=len(payload), sha256=sha256_bytes, payload=inline_payload)
+            )
+
         await self.db.commit()
         await self.db.refresh(session)
         return session
@@ -131,54 +185,42 @@ class SyncService:
         hash_stream = HashStream()
         stats = {"inserted": 0, "duplicates": 0, "invalid": 0}
         
-        async def chunk_payload_stream() -> AsyncIterator[bytes]:
-            stmt = sql_select(SyncChunk).where(SyncChunk.session_id == session_id).order_by(SyncChunk.seq)
-            res = await self.db.stream(stmt)
-            async for row in res:
-                chunk = row[0]
-                hash_stream.update(chunk.payload)
-                yield chunk.payload
+        async def chunk_payload_stream() -> AsyncIterator[Buffer]:
+            async for payload in self.chunk_store.read_stream(session_id):
+                hash_stream.update(payload)
+                yield payload
 
         policy = ServerPolicy(allow_expired=allow_expired, max_clock_skew_sec=settings.MAX_CLOCK_SKEW_SEC)
 
-        async for item in parse_jsonl_stream(chunk_payload_stream()):
-            token = item.get("token")
-            if not token:
-                stats["invalid"] += 1
-                continue
-            
-            try:
-                verified = verify_token(token, policy=policy)
-                env = verified["envelope"]
-                
-                msg = OESPMessage(
-                    from_did=env["from"]["did"],
-                    mid=env["mid"],
-                    ts=env["ts"],
-                    exp=env["exp"],
-                    token=token,
-                    envelope_json=env,
-                    is_expired=env["exp"] < int(time.time()) if "exp" in env else False
-                )
-                
-                try:
-                    self.db.add(msg)
-                    await self.db.flush()
-                    stats["inserted"] += 1
-                except Exception:
-                    await self.db.rollback()
-                    stats["duplicates"] += 1
-                    stmt = sql_select(OESPMessage).where(and_(OESPMessage.from_did == msg.from_did, OESPMessage.mid == msg.mid))
-                    res = await self.db.execute(stmt)
-                    msg = res.scalar_one()
-                
-                session_item = SessionItem(session_id=session_id, message_id=msg.id)
-                await self.db.merge(session_item)
-                
-            except OESPError:
-                stats["invalid"] += 1
-            except Exception:
-                stats["invalid"] += 1
+        # Up to `depth` batches are verified in the executor while the oldest
+        # one is inserted, so inserts stay in stream order.
+        depth = verify_pipeline_depth()
+        pending: Deque[Tuple[List[str], asyncio.Future]] = deque()
+
+        async def ingest_oldest() -> None:
+            tokens, future = pending.popleft()
+            await self._ingest_batch(session_id, tokens, await future, stats)
+
+        try:
+            async for items in parse_jsonl_batches(chunk_payload_stream(), settings.VERIFY_BATCH_SIZE):
+                tokens: List[str] = []
+                for item in items:
+                    token = item.get("token")
+                    if not token:
+                        stats["invalid"] += 1
+                        continue
+                    tokens.append(token)
+
+                if tokens:
+                    pending.append((tokens, asyncio.ensure_future(verify_batch(tokens, policy))))
+                    if len(pending) > depth:
+                        await ingest_oldest()
+
+            while pending:
+                await ingest_oldest()
+        finally:
+            for _, future in pending:
+                future.cancel()
 
         if hash_stream.digest() != final_hash_bytes:
              await self.db.rollback()
@@ -187,9 +229,119 @@ class SyncService:
         session.status = "committed"
         session.final_hash = final_hash_bytes
         self.db.add(session)
+        await self.db.execute(delete(SyncChunk).where(SyncChunk.session_id == session_id))
         await self.db.commit()
+        await self.chunk_store.delete_session(session_id)
         
         return {
             "status": "committed",
             **stats
         }
+
+    async def collect_garbage(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Abort stale open sessions and drop the chunks of sessions that are no longer open."""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.SESSION_TTL_SEC)
+
+        res = await self.db.execute(
+            update(SyncSession)
+            .where(and_(SyncSession.status == "open", SyncSession.created_at < cutoff))
+            .values(status="aborted")
+            .returning(SyncSession.session_id)
+        )
+        aborted = res.scalars().all()
+
+        res = await self.db.execute(select(SyncChunk.session_id).distinct())
+        candidates = set(res.scalars().all()) | set(await self.chunk_store.stored_sessions())
+        if candidates:
+            res = await self.db.execute(
+                select(SyncSession.session_id).where(
+                    and_(SyncSession.session_id.in_(candidates), SyncSession.status == "open")
+                )
+            )
+            candidates -= set(res.scalars().all())
+
+        if candidates:
+            await self.db.execute(delete(SyncChunk).where(SyncChunk.session_id.in_(candidates)))
+        await self.db.commit()
+        for sid in candidates:
+            await self.chunk_store.delete_session(sid)
+
+        return {"aborted": len(aborted), "collected": len(candidates)}
+
+    def _insert(self, model):
+        """Dialect-specific INSERT so bulk paths can use ON CONFLICT."""
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise RuntimeError(f"Unsupported database dialect: {dialect}")
+        return insert(model)
+
+    async def _ingest_batch(
+        self,
+        session_id: UUID,
+        tokens: List[str],
+        results: List[BatchVerifyResult],
+        stats: Dict[str, int]
+    ) -> None:
+        now = int(time.time())
+        received_at = datetime.utcnow()
+        rows: List[Dict[str, Any]] = []
+        for token, res in zip(tokens, results):
+            if not res["ok"]:
+                stats["invalid"] += 1
+                continue
+
+            env = res["result"]["envelope"]
+            rows.append({
+                "id": uuid4(),
+                "from_did": env["from"]["did"],
+                "mid": env["mid"],
+                "ts": env["ts"],
+                "exp": env["exp"],
+                "token": token,
+                "envelope_json": env,
+                "is_expired": env["exp"] < now if "exp" in env else False,
+                "received_at": received_at,
+            })
+
+        size = settings.INSERT_BATCH_SIZE
+        for i in range(0, len(rows), size):
+            await self._bulk_insert_messages(session_id, rows[i:i + size], stats)
+
+    async def _bulk_insert_messages(self, session_id: UUID, rows: List[Dict[str, Any]], stats: Dict[str, int]) -> None:
+        # 1. Multi-row insert, duplicates on (from_did, mid) are skipped
+        stmt = (
+            self._insert(OESPMessage)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["from_did", "mid"])
+            .returning(OESPMessage.id)
+        )
+        res = await self.db.execute(stmt)
+        inserted_ids = set(res.scalars().all())
+        stats["inserted"] += len(inserted_ids)
+        stats["duplicates"] += len(rows) - len(inserted_ids)
+
+        # 2. Resolve ids of duplicates with one set-based query
+        message_ids: Dict[Tuple[str, str], UUID] = {
+            (r["from_did"], r["mid"]): r["id"] for r in rows if r["id"] in inserted_ids
+        }
+        missing = {(r["from_did"], r["mid"]) for r in rows} - message_ids.keys()
+        if missing:
+            stmt = select(OESPMessage.id, OESPMessage.from_did, OESPMessage.mid).where(
+                tuple_(OESPMessage.from_did, OESPMessage.mid).in_(list(missing))
+            )
+            res = await self.db.execute(stmt)
+            for msg_id, from_did, mid in res.all():
+                message_ids[(from_did, mid)] = msg_id
+
+        # 3. Link all messages to the session
+        stmt = (
+            self._insert(SessionItem)
+            .values([{"session_id": session_id, "message_id": msg_id} for msg_id in set(message_ids.values())])
+            .on_conflict_do_nothing(index_elements=["session_id", "message_id"])
+        )
+        await self.db.execute(stmt)
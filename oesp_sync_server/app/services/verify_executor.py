@@ -0,0 +1,49 @@
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Optional
+
+from oesp_sdk.server.verifier import verify_tokens_batch
+from oesp_sdk.server.async_verifier import averify_batch
+from oesp_sdk.server.policies import ServerPolicy
+from oesp_sdk.core.types import BatchVerifyResult
+
+from ..settings import settings
+
+_executor: Optional[Executor] = None
+
+def get_verify_executor() -> Optional[Executor]:
+    """Return the shared verification executor, or None for inline verification."""
+    global _executor
+    if _executor is None:
+        kind = settings.VERIFY_EXECUTOR
+        if kind == "inline":
+            return None
+        if kind == "thread":
+            # PyNaCl releases the GIL during signature checks
+            _executor = ThreadPoolExecutor(max_workers=settings.VERIFY_WORKERS, thread_name_prefix="oesp-verify")
+        elif kind == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.VERIFY_WORKERS)
+        else:
+            raise ValueError(f"Unknown VERIFY_EXECUTOR: {kind}")
+    return _executor
+
+def verify_pipeline_depth() -> int:
+    """How many batches a commit keeps in verification at once."""
+    if settings.VERIFY_PIPELINE_DEPTH:
+        return max(1, settings.VERIFY_PIPELINE_DEPTH)
+    if settings.VERIFY_EXECUTOR == "inline":
+        return 1
+    return settings.VERIFY_WORKERS or os.cpu_count() or 1
+
+def shutdown_verify_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+async def verify_batch(tokens: List[str], policy: ServerPolicy) -> List[BatchVerifyResult]:
+    """Verify a batch of tokens off the event loop."""
+    executor = get_verify_executor()
+    if executor is None:
+        return verify_tokens_batch(tokens, policy=policy)
+    return await averify_batch(tokens, policy=policy, executor=executor)
@@ -7,9 +7,23 @@ class Settings(BaseSettings):
     API_KEY_REQUIRED: bool = False
     GLOBAL_API_KEY: Optional[str] = None
     MAX_CHUNK_BYTES: int = 500_000
+
+    # Chunk payload storage
+    CHUNK_STORE: str = "filesystem"  # "filesystem" | "database"
+    CHUNK_STORE_DIR: str = "./data/chunks"
+    SESSION_TTL_SEC: int = 7 * 24 * 3600
+    GC_INTERVAL_SEC: int = 3600
     
     # OESP SDK Configuration
     MAX_CLOCK_SKEW_SEC: int = 300
+
+    # Token verification during commit
+    VERIFY_EXECUTOR: str = "thread"  # "inline" | "thread" | "process"
+    VERIFY_WORKERS: Optional[int] = None
+    VERIFY_BATCH_SIZE: int = 500
+    # Batches verified ahead of the one being inserted; defaults to VERIFY_WORKERS or the CPU count
+    VERIFY_PIPELINE_DEPTH: Optional[int] = None
+    INSERT_BATCH_SIZE: int = 500
     
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
@@ -1,18 +1,76 @@
 import json
-from typing import AsyncIterator, Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+class JsonlSplitter:
+    """Incremental JSON Lines splitter.
+
+    Scans each chunk with `find` offsets; only the trailing partial line is
+    copied and carried over to the next chunk, so memory stays bounded by the
+    longest line. Chunks may be any bytes-like object supporting `find`
+    (bytes, bytearray, mmap).
+    """
+
+    def __init__(self):
+        self._carry = bytearray()
+
+    def feed(self, chunk) -> List[bytes]:
+        """Return the complete lines terminated in `chunk`."""
+        lines: List[bytes] = []
+        nl = chunk.find(b"\n")
+        if nl == -1:
+            self._carry += chunk
+            return lines
+
+        if self._carry:
+            self._carry += memoryview(chunk)[:nl]
+            lines.append(bytes(self._carry))
+            self._carry.clear()
+        else:
+            lines.append(chunk[:nl])
+
+        start = nl + 1
+        while True:
+            nl = chunk.find(b"\n", start)
+            if nl == -1:
+                break
+            lines.append(chunk[start:nl])
+            start = nl + 1
+
+        if start < len(chunk):
+            self._carry += memoryview(chunk)[start:]
+        return lines
+
+    def close(self) -> Optional[bytes]:
+        """Return the final line if the stream did not end with a newline."""
+        if not self._carry:
+            return None
+        line = bytes(self._carry)
+        self._carry.clear()
+        return line
+
+def _is_blank(line: bytes) -> bool:
+    return not line or line.isspace()
 
 async def parse_jsonl_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, Any]]:
     """Parses a stream of bytes as JSON Lines."""
-    buffer = b""
+    splitter = JsonlSplitter()
     async for chunk in chunks:
-        buffer += chunk
-        while b"\n" in buffer:
-            line, buffer = buffer.split(b"\n", 1)
-            line = line.strip()
-            if line:
+        for line in splitter.feed(chunk):
+            if not _is_blank(line):
                 yield json.loads(line)
-    
+
     # Final line if not ending with \n
-    buffer = buffer.strip()
-    if buffer:
-        yield json.loads(buffer)
+    line = splitter.close()
+    if line is not None and not _is_blank(line):
+        yield json.loads(line)
+
+async def parse_jsonl_batches(chunks: AsyncIterator[bytes], batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Parses a stream of bytes as JSON Lines, yielding lists of up to `batch_size` objects."""
+    batch: List[Dict[str, Any]] = []
+    async for item in parse_jsonl_stream(chunks):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
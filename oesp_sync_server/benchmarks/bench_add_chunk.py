@@ -0,0 +1,85 @@
+"""Regression benchmark for SyncService.add_chunk on large sessions.
+
+Uploads N chunks into one session against an in-memory SQLite database and
+reports the per-chunk latency at the start and end of the session. With O(1)
+ack tracking the two should stay flat; the legacy recount grows linearly.
+
+Usage: python benchmarks/bench_add_chunk.py [--chunks N] [--chunk-bytes B] [--legacy]
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel
+
+from app.models.models import SyncChunk
+from app.services.sync_service import SyncService
+from app.settings import settings
+
+class LegacySyncService(SyncService):
+    """add_chunk as it was: merge, then reload every chunk to count them."""
+
+    async def add_chunk(self, session_id, seq, payload, sha256_bytes, actual_hash=None):
+        session = await self.get_session(session_id)
+        inline_payload = await self.chunk_store.write(session_id, seq, payload)
+        await self.db.merge(SyncChunk(session_id=session_id, seq=seq, size=len(payload), sha256=sha256_bytes, payload=inline_payload))
+        session.last_acked_seq = max(session.last_acked_seq, seq)
+        res = await self.db.execute(select(SyncChunk).where(SyncChunk.session_id == session_id))
+        session.acked_chunks = len(res.scalars().all())
+        self.db.add(session)
+        await self.db.commit()
+        await self.db.refresh(session)
+        return session
+
+async def run(n_chunks: int, chunk_bytes: int, legacy: bool):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    payload = b"x" * chunk_bytes
+    digest = hashlib.sha256(payload).digest()
+    timings = []
+
+    async with maker() as db:
+        service = (LegacySyncService if legacy else SyncService)(db)
+        session = await service.start_session("oesp:did:bench", n_chunks * chunk_bytes, n_chunks, device_pub_b64="YmVuY2g")
+        t_start = time.perf_counter()
+        for seq in range(n_chunks):
+            t0 = time.perf_counter()
+            session = await service.add_chunk(session.session_id, seq, payload, digest)
+            timings.append(time.perf_counter() - t0)
+        total = time.perf_counter() - t_start
+        assert session.acked_chunks == n_chunks
+
+    await engine.dispose()
+
+    window = max(1, n_chunks // 10)
+    first = sum(timings[:window]) / window * 1000
+    last = sum(timings[-window:]) / window * 1000
+    name = "legacy" if legacy else "counter"
+    print(f"{name:8s} {n_chunks} chunks x {chunk_bytes} B: total {total:.2f} s, "
+          f"first {window}: {first:.2f} ms/chunk, last {window}: {last:.2f} ms/chunk")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--chunk-bytes", type=int, default=16_000)
+    parser.add_argument("--legacy", action="store_true", help="also run the previous recount implementation")
+    args = parser.parse_args()
+
+    settings.CHUNK_STORE_DIR = tempfile.mkdtemp(prefix="oesp-bench-chunks-")
+    asyncio.run(run(args.chunks, args.chunk_bytes, legacy=False))
+    if args.legacy:
+        asyncio.run(run(args.chunks, args.chunk_bytes, legacy=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark the incremental JSONL parser against the previous split-based one.
+
+Usage: python benchmarks/bench_jsonl_stream.py [--tokens N] [--chunk-bytes B]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import AsyncIterator, Dict, Any, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils.jsonl_stream import parse_jsonl_stream
+
+async def legacy_parse_jsonl_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    buffer = buffer.strip()
+    if buffer:
+        yield json.loads(buffer)
+
+def make_chunks(n_tokens: int, chunk_bytes: int) -> List[bytes]:
+    # Realistic token size (~700 bytes once wrapped in JSON)
+    line = json.dumps({"token": "OESP1." + "A" * 680}).encode("utf-8")
+    data = b"\n".join([line] * n_tokens) + b"\n"
+    return [data[i:i + chunk_bytes] for i in range(0, len(data), chunk_bytes)]
+
+async def run(parser, chunks: List[bytes]) -> float:
+    async def source():
+        for c in chunks:
+            yield c
+
+    count = 0
+    t0 = time.perf_counter()
+    async for _ in parser(source()):
+        count += 1
+    return time.perf_counter() - t0
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=50_000)
+    parser.add_argument("--chunk-bytes", type=int, default=500_000)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.tokens, args.chunk_bytes)
+    total = sum(len(c) for c in chunks)
+    print(f"{args.tokens} lines, {len(chunks)} chunks, {total / 1e6:.1f} MB")
+
+    for name, fn in (("legacy", legacy_parse_jsonl_stream), ("incremental", parse_jsonl_stream)):
+        elapsed = asyncio.run(run(fn, chunks))
+        print(f"{name:12s} {elapsed * 1000:8.1f} ms  {args.tokens / elapsed:10.0f} lines/s  {total / elapsed / 1e6:7.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
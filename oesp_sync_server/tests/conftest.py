@@ -17,6 +17,11 @@ def event_loop():
     yield loop
     loop.close()
 
+@pytest.fixture(scope="session", autouse=True)
+def chunk_store_dir(tmp_path_factory):
+    settings.CHUNK_STORE_DIR = str(tmp_path_factory.mktemp("chunks"))
+    return settings.CHUNK_STORE_DIR
+
 @pytest_asyncio.fixture(scope="session")
 async def test_engine():
     engine = create_async_engine(TEST_DATABASE_URL, echo=False)
@@ -0,0 +1,21 @@
+import pytest
+from app.utils.jsonl_stream import parse_jsonl_stream, parse_jsonl_batches
+
+async def _source(chunks):
+    for c in chunks:
+        yield c
+
+@pytest.mark.asyncio
+async def test_lines_split_across_chunks():
+    data = b'{"token":"a"}\n\n{"token":"bb"}\r\n  \n{"token":"ccc"}'
+    for size in (1, 3, 7, len(data)):
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        items = [item async for item in parse_jsonl_stream(_source(chunks))]
+        assert items == [{"token": "a"}, {"token": "bb"}, {"token": "ccc"}]
+
+@pytest.mark.asyncio
+async def test_batches():
+    data = b"".join(b'{"n":%d}\n' % i for i in range(5))
+    batches = [b async for b in parse_jsonl_batches(_source([data[:10], data[10:]]), 2)]
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert [item["n"] for b in batches for item in b] == [0, 1, 2, 3, 4]
@@ -152,3 +152,326 @@ async def test_commit_invalid_token(client):
     assert commit_resp.status_code == 200
     data = commit_resp.json()
     assert data["invalid"] == 2
+
+@pytest.mark.asyncio
+async def test_commit_multiple_batches(client, monkeypatch):
+    from app.settings import settings
+    monkeypatch.setattr(settings, "VERIFY_BATCH_SIZE", 2)
+
+    sender_ks = MemoryKeystore()
+    recipient_ks = MemoryKeystore()
+    tokens = [create_test_token(sender_ks, recipient_ks, {"n": i}) for i in range(5)]
+    jsonl = ("\n".join(json.dumps({"token": t}) for t in tokens) + '\n{"token":"OESP1.INVALID"}\n').encode("utf-8")
+
+    device_did = "oesp:did:batch_test"
+    headers = {"X-OESP-DEVICE": device_did}
+
+    start_resp = await client.post("/v1/sync/start", json={
+        "device_did": device_did,
+        "device_pub_b64": b64_encode(b"batch_pub"),
+        "expected_total_bytes": len(jsonl),
+        "expected_total_items": 6
+    }, headers=headers)
+    session_id = start_resp.json()["session_id"]
+
+    await client.post(f"/v1/sync/{session_id}/chunk", json={
+        "seq": 0,
+        "payload_b64": b64_encode(jsonl),
+        "sha256_b64": b64_encode(hashlib.sha256(jsonl).digest())
+    }, headers=headers)
+
+    commit_resp = await client.post(f"/v1/sync/{session_id}/commit", json={
+        "final_hash_b64": b64_encode(hashlib.sha256(jsonl).digest()),
+        "allow_expired": True
+    }, headers=headers)
+
+    assert commit_resp.status_code == 200
+    data = commit_resp.json()
+    assert data["inserted"] == 5
+    assert data["invalid"] == 1
+
+@pytest.mark.asyncio
+async def test_commit_verifies_several_batches_ahead(client, monkeypatch):
+    import asyncio
+    from app.settings import settings
+    from app.services import sync_service
+
+    monkeypatch.setattr(settings, "VERIFY_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "VERIFY_PIPELINE_DEPTH", 4)
+    real_verify = sync_service.verify_batch
+    in_flight = {"now": 0, "max": 0}
+
+    async def slow_verify(tokens, policy):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        try:
+            await asyncio.sleep(0.02)
+            return await real_verify(tokens, policy)
+        finally:
+            in_flight["now"] -= 1
+
+    monkeypatch.setattr(sync_service, "verify_batch", slow_verify)
+
+    sender_ks = MemoryKeystore()
+    recipient_ks = MemoryKeystore()
+    tokens = [create_test_token(sender_ks, recipient_ks, {"n": i}) for i in range(8)]
+    jsonl = "".join(json.dumps({"token": t}) + "\n" for t in tokens).encode("utf-8")
+    session_id, headers = await _start_and_upload(client, "oesp:did:pipeline", jsonl)
+
+    resp = await client.post(f"/v1/sync/{session_id}/commit", json={
+        "final_hash_b64": b64_encode(hashlib.sha256(jsonl).digest())
+    }, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["inserted"] == 8
+    assert in_flight["max"] > 2
+
+@pytest.mark.asyncio
+async def test_commit_duplicates(client):
+    sender_ks = MemoryKeystore()
+    recipient_ks = MemoryKeystore()
+    token1 = create_test_token(sender_ks, recipient_ks, {"msg": "dup"})
+    token2 = create_test_token(sender_ks, recipient_ks, {"msg": "other"})
+
+    device_did = "oesp:did:dup_test"
+    headers = {"X-OESP-DEVICE": device_did}
+
+    async def sync(jsonl: bytes, meta: dict):
+        start_resp = await client.post("/v1/sync/start", json={
+            "device_did": device_did,
+            "device_pub_b64": b64_encode(b"dup_pub"),
+            "expected_total_bytes": len(jsonl),
+            "expected_total_items": 2,
+            "client_meta": meta
+        }, headers=headers)
+        session_id = start_resp.json()["session_id"]
+        await client.post(f"/v1/sync/{session_id}/chunk", json={
+            "seq": 0,
+            "payload_b64": b64_encode(jsonl),
+            "sha256_b64": b64_encode(hashlib.sha256(jsonl).digest())
+        }, headers=headers)
+        resp = await client.post(f"/v1/sync/{session_id}/commit", json={
+            "final_hash_b64": b64_encode(hashlib.sha256(jsonl).digest()),
+            "allow_expired": True
+        }, headers=headers)
+        assert resp.status_code == 200
+        return resp.json()
+
+    first = await sync(f'{{"token":"{token1}"}}\n{{"token":"{token1}"}}\n'.encode("utf-8"), {"run": 1})
+    assert first["inserted"] == 1
+    assert first["duplicates"] == 1
+
+    second = await sync(f'{{"token":"{token1}"}}\n{{"token":"{token2}"}}\n'.encode("utf-8"), {"run": 2})
+    assert second["inserted"] == 1
+    assert second["duplicates"] == 1
+
+@pytest.mark.asyncio
+async def test_sdk_sync_client_roundtrip(client):
+    from httpx import ASGITransport
+    from app.main import app
+    from oesp_sdk.sync import OESPSyncClient
+
+    sender_ks = MemoryKeystore()
+    recipient_ks = MemoryKeystore()
+    tokens = [create_test_token(sender_ks, recipient_ks, {"n": i}) for i in range(10)]
+
+    sync_client = OESPSyncClient(
+        base_url="http://test",
+        max_chunk_bytes=1000,
+        upload_window=1,  # the test fixture shares one DB session across requests
+        transport=ASGITransport(app=app),
+    )
+    res = await sync_client.sync_tokens(
+        tokens,
+        device_did="oesp:did:sdk_client",
+        device_pub_b64=b64_encode(b"sdk_pub"),
+    )
+
+    assert res["success"], res["error"]
+    assert res["inserted"] == 10
+    assert res["invalid"] == 0
+
+@pytest.mark.asyncio
+async def test_raw_chunk_upload(client):
+    from app.settings import settings
+
+    device_did = "oesp:did:raw_chunk"
+    headers = {"X-OESP-DEVICE": device_did}
+    resp = await client.post("/v1/sync/start", json={
+        "device_did": device_did,
+        "device_pub_b64": b64_encode(b"raw_pub"),
+        "expected_total_bytes": 100,
+        "expected_total_items": 1
+    }, headers=headers)
+    session_id = resp.json()["session_id"]
+
+    chunk_payload = b'{"token":"test"}\n'
+    raw_headers = {
+        **headers,
+        "Content-Type": "application/octet-stream",
+        "X-OESP-CHUNK-SHA256": b64_encode(hashlib.sha256(chunk_payload).digest()),
+    }
+
+    resp = await client.put(f"/v1/sync/{session_id}/chunk/0", content=chunk_payload, headers=raw_headers)
+    assert resp.status_code == 200
+    assert resp.json()["acked_chunks"] == 1
+
+    # Hash mismatch
+    resp = await client.put(f"/v1/sync/{session_id}/chunk/1", content=b"other", headers=raw_headers)
+    assert resp.status_code == 400
+
+    # Too large
+    big = b"x" * (settings.MAX_CHUNK_BYTES + 1)
+    resp = await client.put(f"/v1/sync/{session_id}/chunk/1", content=big, headers={
+        **raw_headers, "X-OESP-CHUNK-SHA256": b64_encode(hashlib.sha256(big).digest())
+    })
+    assert resp.status_code == 400
+
+    status = await client.get(f"/v1/sync/{session_id}/status", headers=headers)
+    assert status.json()["acked_seqs"] == [0]
+
+@pytest.mark.asyncio
+async def test_status_hashes_and_restart(client):
+    jsonl = b'{"token":"x"}\n'
+    meta = {"batch_id": "restart"}
+    session_id, headers = await _start_and_upload(client, "oesp:did:restart", jsonl, meta=meta)
+
+    status = (await client.get(f"/v1/sync/{session_id}/status", headers=headers)).json()
+    half = len(jsonl) // 2
+    assert status["chunks"] == [
+        {"seq": 0, "sha256": b64_encode(hashlib.sha256(jsonl[:half]).digest())},
+        {"seq": 1, "sha256": b64_encode(hashlib.sha256(jsonl[half:]).digest())},
+    ]
+
+    start = {
+        "device_did": "oesp:did:restart", "expected_total_bytes": 1, "expected_total_items": 1,
+        "client_meta": meta,
+    }
+    resumed = await client.post("/v1/sync/start", json=start, headers=headers)
+    assert resumed.json()["session_id"] == session_id
+    fresh = await client.post("/v1/sync/start", json={**start, "restart": True}, headers=headers)
+    assert fresh.json()["session_id"] != session_id
+    assert fresh.json()["resume"]["acked_chunks"] == 0
+    old = (await client.get(f"/v1/sync/{session_id}/status", headers=headers)).json()
+    assert old["status"] == "aborted"
+    assert old["chunks"] == []
+
+@pytest.mark.asyncio
+async def test_chunk_ack_counters_out_of_order(client):
+    device_did = "oesp:did:ack_counters"
+    headers = {"X-OESP-DEVICE": device_did}
+    resp = await client.post("/v1/sync/start", json={
+        "device_did": device_did,
+        "device_pub_b64": b64_encode(b"ack_pub"),
+        "expected_total_bytes": 100,
+        "expected_total_items": 3
+    }, headers=headers)
+    session_id = resp.json()["session_id"]
+
+    for seq in (2, 0, 2, 1):
+        payload = f'{{"token":"t{seq}"}}\n'.encode("utf-8")
+        resp = await client.post(f"/v1/sync/{session_id}/chunk", json={
+            "seq": seq,
+            "payload_b64": b64_encode(payload),
+            "sha256_b64": b64_encode(hashlib.sha256(payload).digest())
+        }, headers=headers)
+        assert resp.status_code == 200
+
+    data = resp.json()
+    assert data["acked_chunks"] == 3
+    assert data["last_acked_seq"] == 2
+
+async def _start_and_upload(client, device_did, jsonl, meta=None, raw=False):
+    headers = {"X-OESP-DEVICE": device_did}
+    resp = await client.post("/v1/sync/start", json={
+        "device_did": device_did,
+        "device_pub_b64": b64_encode(device_did.encode("utf-8")),
+        "expected_total_bytes": len(jsonl),
+        "expected_total_items": 1,
+        "client_meta": meta
+    }, headers=headers)
+    session_id = resp.json()["session_id"]
+    half = len(jsonl) // 2
+    for seq, part in enumerate((jsonl[:half], jsonl[half:])):
+        if raw:
+            resp = await client.put(f"/v1/sync/{session_id}/chunk/{seq}", content=part, headers={
+                **headers,
+                "Content-Type": "application/octet-stream",
+                "X-OESP-CHUNK-SHA256": b64_encode(hashlib.sha256(part).digest()),
+            })
+        else:
+            resp = await client.post(f"/v1/sync/{session_id}/chunk", json={
+                "seq": seq,
+                "payload_b64": b64_encode(part),
+                "sha256_b64": b64_encode(hashlib.sha256(part).digest())
+            }, headers=headers)
+        assert resp.status_code == 200
+    return session_id, headers
+
+@pytest.mark.asyncio
+async def test_filesystem_chunks_removed_on_commit(client, chunk_store_dir):
+    import os
+    token = create_test_token(MemoryKeystore(), MemoryKeystore(), {"msg": "fs"})
+    jsonl = f'{{"token":"{token}"}}\n'.encode("utf-8")
+    session_id, headers = await _start_and_upload(client, "oesp:did:fs_store", jsonl)
+
+    session_dir = os.path.join(chunk_store_dir, session_id)
+    assert sorted(os.listdir(session_dir)) == ["00000000.chunk", "00000001.chunk"]
+
+    resp = await client.post(f"/v1/sync/{session_id}/commit", json={
+        "final_hash_b64": b64_encode(hashlib.sha256(jsonl).digest())
+    }, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["inserted"] == 1
+    assert not os.path.exists(session_dir)
+
+@pytest.mark.asyncio
+async def test_filesystem_concurrent_writes_same_seq(tmp_path):
+    import asyncio
+    import os
+    from app.services.chunk_store import FilesystemChunkStore
+
+    store = FilesystemChunkStore(None, str(tmp_path))
+    session_id = uuid4()
+    payloads = [bytes([i]) * 4096 for i in range(8)]
+    await asyncio.gather(*(store.write(session_id, 0, p) for p in payloads))
+    assert os.listdir(tmp_path / str(session_id)) == ["00000000.chunk"]
+    assert (tmp_path / str(session_id) / "00000000.chunk").read_bytes() in payloads
+
+@pytest.mark.asyncio
+async def test_database_chunk_store(client, monkeypatch):
+    from app.settings import settings
+    monkeypatch.setattr(settings, "CHUNK_STORE", "database")
+
+    # Raw uploads hand the store a bytearray, stored inline as is
+    for raw in (False, True):
+        token = create_test_token(MemoryKeystore(), MemoryKeystore(), {"msg": "db"})
+        jsonl = f'{{"token":"{token}"}}\n'.encode("utf-8")
+        session_id, headers = await _start_and_upload(client, f"oesp:did:db_store_{int(raw)}", jsonl, raw=raw)
+
+        resp = await client.post(f"/v1/sync/{session_id}/commit", json={
+            "final_hash_b64": b64_encode(hashlib.sha256(jsonl).digest())
+        }, headers=headers)
+        assert resp.status_code == 200
+        assert resp.json()["inserted"] == 1
+
+@pytest.mark.asyncio
+async def test_garbage_collect_stale_sessions(client, db_session, chunk_store_dir):
+    import os
+    from datetime import datetime, timedelta
+    from uuid import UUID
+    from app.services.sync_service import SyncService
+    from app.settings import settings
+
+    session_id, headers = await _start_and_upload(client, "oesp:did:gc_test", b'{"token":"x"}\n')
+    session_dir = os.path.join(chunk_store_dir, session_id)
+    assert os.path.isdir(session_dir)
+
+    service = SyncService(db_session)
+    future = datetime.utcnow() + timedelta(seconds=settings.SESSION_TTL_SEC + 1)
+    result = await service.collect_garbage(now=future)
+
+    assert result["aborted"] >= 1
+    assert not os.path.exists(session_dir)
+    session = await service.get_session(UUID(session_id))
+    assert session.status == "aborted"
+    assert await service.get_acked_seqs(UUID(session_id)) == []